@@ -1,26 +1,61 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response, stream_with_context, url_for
 from flask_cors import CORS
-from pymongo import MongoClient, ReturnDocument
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
 import jwt
 import bcrypt
 from functools import wraps
 import os
+import re
 from dotenv import load_dotenv
 import ssl
 import time
 from cachetools import TTLCache
 import threading
+import uuid
 from concurrent.futures import ThreadPoolExecutor
+from search_index import CustomerSuggestIndex
+from shared_cache import SQLiteCacheBackend, TwoTierCache
+from token_cache import VerifiedTokenCache
+from password_hasher import HasherBusy, LoginThrottled, PasswordHasher
+from token_revocations import RevocationSet
+from sequence_allocator import SequenceAllocator
+from models import Customer, Tailor, compute_bill_totals
+from json_provider import MongoJSONProvider
+from config import Config
+from blob_store import (BLOB_ID_PATTERN, FALLBACK_CONTENT_TYPE, FilesystemBlobStore, GridFSBlobStore,
+                        make_thumbnail, parse_data_url, safe_content_type)
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # Responses fall back to gzip
+    brotli = None
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+
+# orjson-backed when installed, stdlib otherwise; see json_provider.py
+app.json = MongoJSONProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'rahul@123')
 
+# Short-lived access tokens plus longer refresh tokens; lifetimes in config.py
+JWT_ACCESS_TOKEN_EXPIRES = Config.JWT_ACCESS_TOKEN_EXPIRES
+JWT_REFRESH_TOKEN_EXPIRES = Config.JWT_REFRESH_TOKEN_EXPIRES
+
 # Read frontend URL for CORS from env (default to localhost)
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://star-tailor-website.vercel.app')
 
@@ -30,8 +65,46 @@ CORS(app, origins=[FRONTEND_URL],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'PATCH'],
      allow_headers=['Content-Type', 'Authorization', 'X-Requested-With'])
 
-# Simple caching for frequently accessed data
-cache = TTLCache(maxsize=100, ttl=300)  # 5 minute TTL
+# Cached data lives in named namespaces, each with its own size and TTL, so a
+# burst of logins cannot evict settings or dashboard entries. Every namespace
+# is an in-process L1 in front of a SQLite file shared by the workers on the
+# host; pop() is broadcast, so other workers drop the key within
+# CACHE_SYNC_SECONDS. CACHE_BACKEND=memory keeps each worker's cache private.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+# The default lives in a private directory next to the app (created 0700), not
+# in a world-writable temp dir where another local user could plant the file
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_data', 'cache.sqlite3'))
+CACHE_SYNC_SECONDS = float(os.getenv('CACHE_SYNC_SECONDS', '1'))
+cache_backend = SQLiteCacheBackend(CACHE_PATH) if CACHE_BACKEND == 'sqlite' else None
+cache_namespaces = {}
+
+def cache_namespace(name, maxsize, ttl, stale_ttl=0, shared=True):
+    # CACHE_<NAME>_SIZE overrides the namespace's entry limit; shared=False
+    # keeps the namespace in this process only (no L2, no broadcast pops)
+    cache_namespaces[name] = TwoTierCache(
+        backend=cache_backend if shared else None,
+        name=name,
+        maxsize=int(os.getenv(f'CACHE_{name.upper()}_SIZE', maxsize)),
+        ttl=ttl,
+        stale_ttl=stale_ttl,
+        sync_interval=CACHE_SYNC_SECONDS
+    )
+    return cache_namespaces[name]
+
+settings_cache = cache_namespace('settings', maxsize=16, ttl=300)  # 5 minute TTL
+
+# Tokens token_required has already verified, with their user. A hit costs one
+# hash lookup; entries live until the token expires or its user is revoked.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '4096'))
+token_cache = VerifiedTokenCache(maxsize=TOKEN_CACHE_SIZE, max_age=JWT_ACCESS_TOKEN_EXPIRES)
+
+# In-memory prefix/trigram index behind /api/customers/suggest
+SUGGEST_INDEX_MAX_MB = int(os.getenv('SUGGEST_INDEX_MAX_MB', '128'))
+SUGGEST_INDEX_REFRESH_SECONDS = int(os.getenv('SUGGEST_INDEX_REFRESH_SECONDS', '600'))
+customer_suggest_index = CustomerSuggestIndex(max_bytes=SUGGEST_INDEX_MAX_MB * 1024 * 1024)
+
+# How often the incrementally maintained dashboard counters are recounted
+DASHBOARD_RECONCILE_SECONDS = int(os.getenv('DASHBOARD_RECONCILE_SECONDS', '900'))
 
 # Handle preflight requests globally
 @app.before_request
@@ -54,6 +127,8 @@ tailors_collection = None
 settings_collection = None
 jobs_collection = None
 counters_collection = None
+rollups_collection = None
+revocations_collection = None
 
 # Connect to MongoDB with SSL options
 try:
@@ -83,6 +158,8 @@ try:
     settings_collection = db.settings
     jobs_collection = db.jobs
     counters_collection = db.counters
+    rollups_collection = db.daily_rollups
+    revocations_collection = db.token_revocations
     
     # Create indexes for better performance
     def create_indexes():
@@ -90,34 +167,64 @@ try:
             # Customer indexes
             customers_collection.create_index([("phone", 1)], unique=True)
             customers_collection.create_index([("name", "text"), ("phone", "text"), ("email", "text")])
-            customers_collection.create_index([("created_at", -1)])
+            customers_collection.create_index([("created_at", -1), ("_id", -1)])
+            customers_collection.create_index([("name_lower", 1)])
+            customers_collection.create_index([("name_words", 1)])
+            customers_collection.create_index([("email_lower", 1)])
+            customers_collection.create_index([("phone_digits", 1)])
+            customers_collection.create_index([("outstanding_balance", -1)])
             
             # Bill indexes
             bills_collection.create_index([("customer_id", 1)])
             bills_collection.create_index([("status", 1)])
-            bills_collection.create_index([("created_at", -1)])
+            bills_collection.create_index([("created_at", -1), ("_id", -1)])
             bills_collection.create_index([("bill_no", 1)], unique=True)
             
             # Tailor indexes
             tailors_collection.create_index([("phone", 1)], unique=True)
             tailors_collection.create_index([("name", "text"), ("phone", "text"), ("specialization", "text")])
+            tailors_collection.create_index([("created_at", -1), ("_id", -1)])
             
             # Job indexes
             jobs_collection.create_index([("tailor_id", 1)])
             jobs_collection.create_index([("status", 1)])
-            jobs_collection.create_index([("created_at", -1)])
+            jobs_collection.create_index([("created_at", -1), ("_id", -1)])
+            jobs_collection.create_index([("tailor_id", 1), ("created_at", -1), ("_id", -1)])
             
             # User indexes
             users_collection.create_index([("username", 1)], unique=True)
             
+            # Token revocations drop out once every token they cover has expired
+            revocations_collection.create_index([("expires_at", 1)], expireAfterSeconds=0)
+            revocations_collection.create_index([("created_at", 1)])
+            
             print("✅ Database indexes created successfully!")
         except Exception as e:
             print(f"⚠️  Index creation error: {str(e)}")
-    
-    # Run index creation in background
-    index_thread = threading.Thread(target=create_indexes)
-    index_thread.daemon = True
-    index_thread.start()
+        
+        # Fill search fields on customers created before they existed
+        try:
+            updated = backfill_customer_search_fields()
+            if updated:
+                print(f"✅ Backfilled search fields on {updated} customers")
+        except Exception as e:
+            print(f"⚠️  Customer search backfill error: {str(e)}")
+        
+        # Materialize bill summaries for customers that predate them
+        try:
+            if customers_collection.find_one({'order_count': {'$exists': False}}, {'_id': 1}) is not None:
+                reconciled = rebuild_customer_summaries()
+                print(f"✅ Rebuilt bill summaries for {reconciled} customers")
+        except Exception as e:
+            print(f"⚠️  Customer summary rebuild error: {str(e)}")
+        
+        # Seed the daily revenue rollups from existing bills
+        try:
+            if rollups_collection.find_one({}, {'_id': 1}) is None and bills_collection.find_one({}, {'_id': 1}) is not None:
+                days = rebuild_daily_rollups()
+                print(f"✅ Rebuilt daily rollups for {days} days")
+        except Exception as e:
+            print(f"⚠️  Daily rollup rebuild error: {str(e)}")
     
 except Exception as e:
     print(f"❌ MongoDB connection failed: {str(e)}")
@@ -135,12 +242,89 @@ if client is not None:
     settings_collection = db.settings
     jobs_collection = db.jobs
     counters_collection = db.counters
+    rollups_collection = db.daily_rollups
+    revocations_collection = db.token_revocations
 else:
     # Create dummy collections to prevent crashes during development
     users_collection = customers_collection = bills_collection = None
     tailors_collection = settings_collection = jobs_collection = counters_collection = None
+    rollups_collection = revocations_collection = None
     print("⚠️  Running in dummy mode without database connection")
 
+# Blob storage for bill design images, drawings and signatures. GridFS in
+# production; BLOB_STORE=filesystem (or no database) uses a local directory.
+BLOB_STORE = os.getenv('BLOB_STORE', 'gridfs')
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blob_data'))
+if BLOB_STORE == 'filesystem' or db is None:
+    blob_store = FilesystemBlobStore(BLOB_STORE_PATH)
+else:
+    blob_store = GridFSBlobStore(db)
+
+# Thumbnails are generated off the request path by a small worker pool
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '2'))
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', '16'))
+IMPORT_MAX_MB = int(os.getenv('IMPORT_MAX_MB', '256'))
+
+# Request bodies are capped while werkzeug reads them, so chunked uploads
+# without a Content-Length are limited too. The streaming customer import
+# takes whole files and gets its own, larger cap.
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+class AppRequest(Request):
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'import_customers_route':
+            return IMPORT_MAX_MB * 1024 * 1024
+        return super().max_content_length
+
+app.request_class = AppRequest
+
+@app.errorhandler(413)
+def request_too_large(e):
+    limit_mb = (request.max_content_length or 0) // (1024 * 1024)
+    return jsonify({'message': f'Upload exceeds {limit_mb} MB'}), 413
+
+thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+thumbnails_pending = set()
+thumbnails_lock = threading.Lock()
+
+# Revoked users and refresh tokens, mirrored in memory; see token_revocations.py
+token_revocations = RevocationSet(
+    revocations_collection,
+    sync_interval=Config.TOKEN_REVOCATION_SYNC_SECONDS,
+    on_user_revoked=token_cache.forget_user
+)
+
+def issue_tokens(user):
+    # Access tokens carry everything token_required needs, so checking one never
+    # reads the users collection; refresh tokens are single-use (see refresh)
+    now = datetime.utcnow()
+    # Millisecond issue time, so a revocation does not catch a login made in
+    # the same second right after it (iat only has whole seconds)
+    issued_ms = int(now.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    access_token = jwt.encode({
+        'type': 'access',
+        'user_id': str(user['_id']),
+        'username': user['username'],
+        'role': user['role'],
+        'iat': now,
+        'iat_ms': issued_ms,
+        'exp': now + timedelta(seconds=JWT_ACCESS_TOKEN_EXPIRES)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    refresh_token = jwt.encode({
+        'type': 'refresh',
+        'jti': uuid.uuid4().hex,
+        'user_id': str(user['_id']),
+        'iat': now,
+        'iat_ms': issued_ms,
+        'exp': now + timedelta(seconds=JWT_REFRESH_TOKEN_EXPIRES)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    return {
+        'token': access_token,
+        'refresh_token': refresh_token,
+        'expires_in': JWT_ACCESS_TOKEN_EXPIRES
+    }
+
 # JWT token decorator
 def token_required(f):
     @wraps(f)
@@ -154,28 +338,33 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
             
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            # Picks up revocations made by other workers (rate limited)
+            token_revocations.sync()
             
-            # Use cache for user lookup
-            cache_key = f"user_{data['user_id']}"
-            current_user = cache.get(cache_key)
+            cached = token_cache.get(token)
             
-            if current_user is None:
-                if users_collection is None:
-                    # Dummy user for development when DB is not available
-                    current_user = {
-                        '_id': ObjectId(),
-                        'username': 'admin',
-                        'role': 'admin'
-                    }
-                else:
-                    current_user = users_collection.find_one({'_id': ObjectId(data['user_id'])}, 
-                                                           {'password': 0})  # Exclude password
+            if cached is None:
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
                 
-                if current_user is not None:
-                    cache[cache_key] = current_user
-                else:
+                # Refresh tokens are only accepted by /api/auth/refresh; tokens
+                # issued before they existed have no type
+                if data.get('type', 'access') != 'access':
                     return jsonify({'message': 'Token is invalid'}), 401
+                
+                current_user = {
+                    '_id': ObjectId(data['user_id']),
+                    'username': data.get('username'),
+                    'role': data.get('role')
+                }
+                token_cache.put(token, data, current_user)
+            else:
+                data, current_user = cached
+            
+            # Checked on every request, cached or not (an in-memory lookup), and
+            # after put() so a revocation landing in between still applies
+            if token_revocations.is_revoked(data):
+                token_cache.forget(token)
+                return jsonify({'message': 'Token has been revoked'}), 401
                     
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
@@ -186,23 +375,37 @@ def token_required(f):
     
     return decorated
 
-# Utility: Atomic sequence generator for bill numbers
-def get_next_sequence(name: str) -> int:
+# Utility: Sequence generator for bill numbers. By default each worker leases
+# SEQUENCE_BLOCK_SIZE numbers at a time; SEQUENCE_MODE=gapless takes every
+# number from the counter document. Gapless is best-effort: numbers of failed
+# inserts are only given back when nothing was taken after them.
+SEQUENCE_MODE = os.getenv('SEQUENCE_MODE', 'leased')
+SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '20'))
+sequence_allocators = {}
+sequence_allocators_lock = threading.Lock()
+
+def get_sequence_allocator(name: str) -> SequenceAllocator:
+    with sequence_allocators_lock:
+        allocator = sequence_allocators.get(name)
+        if allocator is None or allocator.collection is not counters_collection:
+            allocator = SequenceAllocator(counters_collection, name, SEQUENCE_BLOCK_SIZE,
+                                          gapless=SEQUENCE_MODE == 'gapless')
+            sequence_allocators[name] = allocator
+        return allocator
+
+# Reserve `count` consecutive numbers; returns the first
+def reserve_sequence_block(name: str, count: int) -> int:
     if counters_collection is None:
-        # Fallback for when DB is not available
         return 1
-    
-    try:
-        doc = counters_collection.find_one_and_update(
-            {'_id': name},
-            {'$inc': {'seq': 1}},
-            upsert=True,
-            return_document=ReturnDocument.AFTER
-        )
-        return int(doc.get('seq', 1))
-    except Exception:
-        # Fallback in case counters collection isn't available
-        return bills_collection.count_documents({}) + 1 if bills_collection is not None else 1
+    return get_sequence_allocator(name).take(count)
+
+def get_next_sequence(name: str) -> int:
+    # Errors propagate: guessing a number here could collide with the unique index
+    return reserve_sequence_block(name, 1)
+
+def release_sequence_block(name: str, first: int, count: int = 1):
+    if counters_collection is not None:
+        get_sequence_allocator(name).release(first, count)
 
 def format_bill_no(n: int, width: int = 3) -> str:
     try:
@@ -210,6 +413,862 @@ def format_bill_no(n: int, width: int = 3) -> str:
     except Exception:
         return str(n)
 
+# Utility: Normalized customer search fields
+def normalize_phone(phone) -> str:
+    digits = re.sub(r'\D', '', str(phone or ''))
+    # Store Indian numbers without the country code or trunk prefix
+    if len(digits) == 12 and digits.startswith('91'):
+        return digits[2:]
+    if len(digits) == 11 and digits.startswith('0'):
+        return digits[1:]
+    return digits
+
+def customer_search_fields(name, phone, email=None) -> dict:
+    # name_words holds each word of the name so a one-word search can prefix
+    # match any of them through a (multikey) index; email_lower does the same
+    # for emails, which the text index only matches as whole tokens
+    name_lower = ' '.join(str(name or '').lower().split())
+    return {
+        'name_lower': name_lower,
+        'name_words': sorted(set(name_lower.split())),
+        'email_lower': (str(email).strip().lower() or None) if email else None,
+        'phone_digits': normalize_phone(phone)
+    }
+
+PHONE_SEARCH_PATTERN = re.compile(r'^[\d\s+\-()]+$')
+
+def build_customer_search_query(search: str) -> dict:
+    search = search.strip()
+    if not search:
+        return {}
+
+    # Phone numbers: prefix match on the digits-only field
+    digits = normalize_phone(search[3:] if search.startswith('+91') else search).lstrip('0')
+    if digits and PHONE_SEARCH_PATTERN.match(search):
+        return {'phone_digits': {'$regex': '^' + digits}}
+
+    # Emails: anchored prefix match on the lowercase email field
+    if '@' in search:
+        return {'email_lower': {'$regex': '^' + re.escape(search.lower())}}
+
+    # Multi-word queries: use the text index
+    if len(search.split()) > 1:
+        return {'$text': {'$search': search}}
+
+    # Single word: anchored prefix match on any word of the name or on the
+    # email. Every branch is an indexed prefix scan; name_lower also covers
+    # customers the name_words backfill has not reached yet
+    word = '^' + re.escape(search.lower())
+    return {'$or': [
+        {'name_lower': {'$regex': word}},
+        {'name_words': {'$regex': word}},
+        {'email_lower': {'$regex': word}}
+    ]}
+
+def backfill_customer_search_fields(batch_size: int = 1000) -> int:
+    if customers_collection is None:
+        return 0
+
+    missing = {
+        '$or': [
+            {'name_lower': {'$exists': False}},
+            {'name_words': {'$exists': False}},
+            {'email_lower': {'$exists': False}},
+            {'phone_digits': {'$exists': False}}
+        ]
+    }
+    updated = 0
+    batch = []
+    projection = {'name': 1, 'phone': 1, 'email': 1}
+    for customer in customers_collection.find(missing, projection).batch_size(batch_size):
+        batch.append(UpdateOne(
+            {'_id': customer['_id']},
+            {'$set': customer_search_fields(customer.get('name'), customer.get('phone'), customer.get('email'))}
+        ))
+        if len(batch) >= batch_size:
+            updated += customers_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += customers_collection.bulk_write(batch, ordered=False).modified_count
+    # Searches can match customers they did not before
+    if updated:
+        bump_list_version('customers')
+    return updated
+
+# Rebuild the suggest index from the database. Runs at startup and then
+# periodically, which also picks up customers written by other workers.
+def refresh_customer_suggest_index():
+    if customers_collection is None:
+        return
+    customer_suggest_index.load(
+        customers_collection.find({}, {'name': 1, 'phone': 1}).batch_size(2000)
+    )
+
+def customer_suggest_index_loop():
+    while True:
+        try:
+            refresh_customer_suggest_index()
+        except Exception as e:
+            print(f"⚠️  Customer suggest index refresh error: {str(e)}")
+        time.sleep(SUGGEST_INDEX_REFRESH_SECONDS)
+
+# Utility: Materialized per-customer bill summaries kept on the customer
+# document. Outstanding balance counts pending bills only.
+BILL_STATUSES = ['pending', 'in_progress', 'completed', 'delivered', 'cancelled']
+
+def empty_customer_summary() -> dict:
+    return {'order_count': 0, 'total_spent': 0, 'outstanding_balance': 0}
+
+def outstanding_of(bill, status=None) -> float:
+    status = bill.get('status') if status is None else status
+    return bill.get('balance', 0) if status == 'pending' else 0
+
+def apply_customer_summaries(bills, sign: int = 1):
+    if customers_collection is None:
+        return
+
+    deltas = {}
+    for bill in bills:
+        delta = deltas.setdefault(bill['customer_id'], empty_customer_summary())
+        delta['order_count'] += sign
+        delta['total_spent'] += sign * bill.get('total', 0)
+        delta['outstanding_balance'] += sign * outstanding_of(bill)
+
+    if deltas:
+        customers_collection.bulk_write([
+            UpdateOne({'_id': customer_id}, {'$inc': delta})
+            for customer_id, delta in deltas.items()
+        ], ordered=False)
+
+def apply_bill_status_change(bill, new_status: str):
+    change = outstanding_of(bill, new_status) - outstanding_of(bill)
+    if change and customers_collection is not None:
+        customers_collection.update_one(
+            {'_id': bill['customer_id']},
+            {'$inc': {'outstanding_balance': change}}
+        )
+
+def rebuild_customer_summaries(batch_size: int = 1000) -> int:
+    if customers_collection is None or bills_collection is None:
+        return 0
+
+    pipeline = [
+        {
+            '$group': {
+                '_id': '$customer_id',
+                'order_count': {'$sum': 1},
+                'total_spent': {'$sum': '$total'},
+                'outstanding_balance': {
+                    '$sum': {'$cond': [{'$eq': ['$status', 'pending']}, '$balance', 0]}
+                }
+            }
+        }
+    ]
+    actual = {
+        row['_id']: {
+            'order_count': row['order_count'],
+            'total_spent': row['total_spent'],
+            'outstanding_balance': row['outstanding_balance']
+        }
+        for row in bills_collection.aggregate(pipeline, allowDiskUse=True)
+    }
+
+    # Only write customers whose stored summary has drifted
+    reconciled = 0
+    batch = []
+    projection = {'order_count': 1, 'total_spent': 1, 'outstanding_balance': 1}
+    for customer in customers_collection.find({}, projection).batch_size(batch_size):
+        expected = actual.get(customer['_id'], empty_customer_summary())
+        if any(customer.get(field) != value for field, value in expected.items()):
+            batch.append(UpdateOne({'_id': customer['_id']}, {'$set': expected}))
+        if len(batch) >= batch_size:
+            reconciled += customers_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        reconciled += customers_collection.bulk_write(batch, ordered=False).modified_count
+    return reconciled
+
+# Utility: Dashboard counters maintained with $inc in the write paths. The
+# counters document is only created by reconciliation, so increments made
+# before the first recount are dropped rather than seeding partial totals.
+DASHBOARD_COUNTERS_ID = 'dashboard_stats'
+PENDING_JOB_STATUSES = ['assigned', 'in_progress']
+
+def day_bills_counter_id(day: datetime) -> str:
+    return f"bills_on_{day.strftime('%Y-%m-%d')}"
+
+def bump_dashboard_counters(**deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas or counters_collection is None:
+        return
+    counters_collection.update_one(
+        {'_id': DASHBOARD_COUNTERS_ID},
+        {'$inc': deltas, '$set': {'updated_at': datetime.now()}}
+    )
+    # Cleared after the update, so a recompute cannot cache the old counts
+    clear_dashboard_cache()
+
+def bump_day_bills(day: datetime, delta: int):
+    if delta and counters_collection is not None:
+        counters_collection.update_one(
+            {'_id': day_bills_counter_id(day)},
+            {'$inc': {'count': delta}},
+            upsert=True
+        )
+        clear_dashboard_cache()
+
+def compute_dashboard_stats() -> dict:
+    # Use parallel execution for better performance
+    def get_count(collection, query=None):
+        try:
+            return collection.count_documents(query if query else {})
+        except:
+            return 0
+    
+    with ThreadPoolExecutor() as executor:
+        # Submit all count operations in parallel
+        future_total_customers = executor.submit(get_count, customers_collection)
+        future_total_bills = executor.submit(get_count, bills_collection)
+        future_total_tailors = executor.submit(get_count, tailors_collection)
+        future_total_jobs = executor.submit(get_count, jobs_collection)
+        future_pending_jobs = executor.submit(get_count, jobs_collection, {'status': {'$in': PENDING_JOB_STATUSES}})
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        future_today_bills = executor.submit(get_count, bills_collection, {
+            'created_at': {'$gte': today, '$lt': tomorrow}
+        })
+        
+        # Get revenue in separate thread
+        def get_revenue():
+            try:
+                pipeline = [{'$group': {'_id': None, 'total_revenue': {'$sum': '$total'}}}]
+                revenue_result = list(bills_collection.aggregate(pipeline))
+                return revenue_result[0]['total_revenue'] if revenue_result else 0
+            except:
+                return 0
+        
+        future_total_revenue = executor.submit(get_revenue)
+        
+        # Wait for all results
+        return {
+            'total_customers': future_total_customers.result(),
+            'total_bills': future_total_bills.result(),
+            'total_tailors': future_total_tailors.result(),
+            'total_jobs': future_total_jobs.result(),
+            'pending_jobs': future_pending_jobs.result(),
+            'today_bills': future_today_bills.result(),
+            'total_revenue': future_total_revenue.result()
+        }
+
+def reconcile_dashboard_counters() -> dict:
+    stats = compute_dashboard_stats()
+    now = datetime.now()
+    counters = {field: value for field, value in stats.items() if field != 'today_bills'}
+    counters_collection.update_one(
+        {'_id': DASHBOARD_COUNTERS_ID},
+        {'$set': {**counters, 'updated_at': now, 'reconciled_at': now}},
+        upsert=True
+    )
+    counters_collection.update_one(
+        {'_id': day_bills_counter_id(now)},
+        {'$set': {'count': stats['today_bills']}},
+        upsert=True
+    )
+    clear_dashboard_cache()
+    return stats
+
+def dashboard_reconcile_loop():
+    while True:
+        time.sleep(DASHBOARD_RECONCILE_SECONDS)
+        try:
+            if counters_collection is not None:
+                reconcile_dashboard_counters()
+        except Exception as e:
+            print(f"⚠️  Dashboard counter reconciliation error: {str(e)}")
+
+# Utility: Daily revenue rollups keyed by 'YYYY-MM-DD'. Outstanding is the
+# balance of that day's bills that are still pending.
+def rollup_day_id(day: datetime) -> str:
+    return day.strftime('%Y-%m-%d')
+
+def apply_daily_rollups(bills, sign: int = 1):
+    if rollups_collection is None:
+        return
+
+    deltas = {}
+    for bill in bills:
+        created_at = bill['created_at']
+        delta = deltas.setdefault(rollup_day_id(created_at), {
+            'date': created_at.replace(hour=0, minute=0, second=0, microsecond=0),
+            'inc': {'bill_count': 0, 'revenue': 0, 'discount': 0, 'advance': 0, 'outstanding': 0}
+        })['inc']
+        delta['bill_count'] += sign
+        delta['revenue'] += sign * bill.get('total', 0)
+        delta['discount'] += sign * bill.get('discount', 0)
+        delta['advance'] += sign * bill.get('advance', 0)
+        delta['outstanding'] += sign * outstanding_of(bill)
+
+    if deltas:
+        rollups_collection.bulk_write([
+            UpdateOne(
+                {'_id': day_id},
+                {'$inc': delta['inc'], '$setOnInsert': {'date': delta['date']}},
+                upsert=sign > 0
+            )
+            for day_id, delta in deltas.items()
+        ], ordered=False)
+
+def apply_rollup_status_change(bill, new_status: str):
+    change = outstanding_of(bill, new_status) - outstanding_of(bill)
+    if change and rollups_collection is not None and bill.get('created_at'):
+        rollups_collection.update_one(
+            {'_id': rollup_day_id(bill['created_at'])},
+            {'$inc': {'outstanding': change}}
+        )
+
+def rebuild_daily_rollups() -> int:
+    if rollups_collection is None or bills_collection is None:
+        return 0
+
+    pipeline = [
+        {'$match': {'created_at': {'$type': 'date'}}},
+        {
+            '$group': {
+                '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                'bill_count': {'$sum': 1},
+                'revenue': {'$sum': '$total'},
+                'discount': {'$sum': '$discount'},
+                'advance': {'$sum': '$advance'},
+                'outstanding': {
+                    '$sum': {'$cond': [{'$eq': ['$status', 'pending']}, '$balance', 0]}
+                }
+            }
+        }
+    ]
+    day_ids = []
+    updates = []
+    for row in bills_collection.aggregate(pipeline, allowDiskUse=True):
+        row['date'] = datetime.strptime(row['_id'], '%Y-%m-%d')
+        day_ids.append(row['_id'])
+        updates.append(UpdateOne({'_id': row['_id']}, {'$set': row}, upsert=True))
+
+    if updates:
+        rollups_collection.bulk_write(updates, ordered=False)
+    # Drop days whose bills have all been deleted
+    rollups_collection.delete_many({'_id': {'$nin': day_ids}})
+    return len(day_ids)
+
+def parse_report_range():
+    try:
+        to_date = request.args.get('to_date') or rollup_day_id(datetime.now())
+        to_day = datetime.strptime(to_date, '%Y-%m-%d')
+        from_date = request.args.get('from_date') or rollup_day_id(to_day - timedelta(days=29))
+        from_day = datetime.strptime(from_date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError('Dates must use the YYYY-MM-DD format')
+    if from_day > to_day:
+        raise ValueError('from_date must not be after to_date')
+    return rollup_day_id(from_day), rollup_day_id(to_day)
+
+def sum_daily_rollups(from_date: str, to_date: str):
+    totals = {'bill_count': 0, 'revenue': 0, 'discount': 0, 'advance': 0, 'outstanding': 0}
+    days = []
+    if rollups_collection is not None:
+        for day in rollups_collection.find({'_id': {'$gte': from_date, '$lte': to_date}}).sort('_id', 1):
+            for field in totals:
+                totals[field] += day.get(field, 0)
+            days.append(day)
+    return totals, days
+
+# Utility: Bill list filters shared by GET /api/bills and the CSV export
+def build_bills_query(params) -> dict:
+    search = params.get('search', '')
+    status = params.get('status', '')
+    customer_id = params.get('customer_id', '')
+    
+    query = {}
+    
+    if search:
+        try:
+            # First try to find customer by ID for exact matches
+            if ObjectId.is_valid(search):
+                query['customer_id'] = ObjectId(search)
+            else:
+                # Resolve matching customers through the indexed search fields
+                customers = customers_collection.find(
+                    build_customer_search_query(search), {'_id': 1}
+                ).limit(10)
+                customer_ids = [customer['_id'] for customer in customers]
+                if customer_ids:
+                    query['customer_id'] = {'$in': customer_ids}
+        except Exception as e:
+            print(f"Search optimization error: {str(e)}")
+    
+    if status:
+        query['status'] = status
+    
+    if customer_id:
+        try:
+            query['customer_id'] = ObjectId(customer_id)
+        except Exception:
+            raise ValueError('Invalid customer ID format')
+    
+    return query
+
+# Utility: Generate a thumbnail for an image blob in the worker pool. Each
+# blob is queued at most once at a time and skipped if it already has one.
+def generate_thumbnail(blob_id: str):
+    try:
+        if blob_store.thumbnail_of(blob_id):
+            return
+        data = blob_store.read(blob_id)
+        if data is None:
+            return
+        thumbnail = make_thumbnail(data)
+        if thumbnail is not None:
+            blob_store.set_thumbnail(blob_id, blob_store.put(*thumbnail))
+    except Exception as e:
+        print(f"Thumbnail generation failed for {blob_id}: {str(e)}")
+    finally:
+        with thumbnails_lock:
+            thumbnails_pending.discard(blob_id)
+
+def schedule_thumbnail(blob_id: str, content_type: str):
+    if not content_type.startswith('image/'):
+        return
+    with thumbnails_lock:
+        if blob_id in thumbnails_pending:
+            return
+        thumbnails_pending.add(blob_id)
+    thumbnail_executor.submit(generate_thumbnail, blob_id)
+
+def store_blob(data: bytes, content_type: str) -> dict:
+    content_type = safe_content_type(content_type)
+    blob_id = blob_store.put(data, content_type)
+    schedule_thumbnail(blob_id, content_type)
+    return {'blob_id': blob_id, 'content_type': content_type, 'size': len(data)}
+
+# Utility: Move inline data URLs out of bill documents into the blob store,
+# leaving a content-addressed reference behind. References to blobs that were
+# already uploaded (a ref dict or a /api/blobs/<id> URL) are kept as they are.
+BLOB_URL_PATTERN = re.compile(r'/api/blobs/([0-9a-f]{64})(?:/thumbnail)?(?:[?#].*)?$')
+
+def offload_blob(value):
+    if isinstance(value, dict):
+        blob_id = str(value.get('blob_id', ''))
+        if BLOB_ID_PATTERN.match(blob_id) and blob_store.exists(blob_id):
+            return {key: value[key] for key in ('blob_id', 'content_type', 'size') if key in value}
+    if isinstance(value, str):
+        match = BLOB_URL_PATTERN.search(value)
+        if match and blob_store.exists(match.group(1)):
+            return {'blob_id': match.group(1)}
+    parsed = parse_data_url(value)
+    if parsed is None:
+        return value
+    return store_blob(*parsed)
+
+def offload_bill_blobs(data) -> dict:
+    return {
+        'design_images': [offload_blob(value) for value in data.get('design_images') or []],
+        'drawings': [offload_blob(value) for value in data.get('drawings') or []],
+        'signature': offload_blob(data.get('signature', ''))
+    }
+
+def offload_existing_bill_blobs(batch_size: int = 100) -> int:
+    if bills_collection is None:
+        return 0
+
+    inline = {
+        '$or': [
+            {'design_images': {'$regex': '^data:'}},
+            {'drawings': {'$regex': '^data:'}},
+            {'signature': {'$regex': '^data:'}}
+        ]
+    }
+    migrated = 0
+    projection = {'design_images': 1, 'drawings': 1, 'signature': 1}
+    for bill in bills_collection.find(inline, projection).batch_size(batch_size):
+        bills_collection.update_one({'_id': bill['_id']}, {'$set': offload_bill_blobs(bill)})
+        migrated += 1
+    # List thumbnails now point at the blob routes
+    if migrated:
+        bump_list_version('bills')
+    return migrated
+
+def with_blob_url(value):
+    if isinstance(value, dict) and 'blob_id' in value:
+        return {
+            **value,
+            'url': url_for('get_blob', blob_id=value['blob_id'], _external=True),
+            'thumbnail_url': url_for('get_blob_thumbnail', blob_id=value['blob_id'], _external=True)
+        }
+    return value
+
+def expand_bill_blobs(bill: dict) -> dict:
+    for field in ('design_images', 'drawings'):
+        if isinstance(bill.get(field), list):
+            bill[field] = [with_blob_url(value) for value in bill[field]]
+    if 'signature' in bill:
+        bill['signature'] = with_blob_url(bill['signature'])
+    return bill
+
+# Utility: Shared by single and bulk bill creation
+BILL_REQUIRED_FIELDS = ['customer_id', 'customer_name', 'items']
+# Subtotal, total, balance and item totals are recomputed from these, so
+# whatever the client sent for them is ignored
+BILL_AMOUNT_FIELDS = ['discount', 'advance']
+ITEM_AMOUNT_FIELDS = ['price', 'quantity']
+
+def is_amount(value) -> bool:
+    # bool is an int subclass and passes float(), but not Decimal(str(value))
+    if isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(float(value)) and float(value) >= 0
+    except (TypeError, ValueError):
+        return False
+
+def bill_payload_error(data):
+    if not isinstance(data, dict):
+        return 'Bill must be an object'
+    for field in BILL_REQUIRED_FIELDS:
+        if field not in data:
+            return f'Missing required field: {field}'
+    if not isinstance(data['items'], list) or len(data['items']) == 0:
+        return 'Items must be a non-empty array'
+    for field in BILL_AMOUNT_FIELDS:
+        if not is_amount(data.get(field, 0)):
+            return f'{field} must be a non-negative number'
+    for position, item in enumerate(data['items'], start=1):
+        if not isinstance(item, dict):
+            return f'Item {position} must be an object'
+        for field in ITEM_AMOUNT_FIELDS:
+            if field in item and not is_amount(item[field]):
+                return f'Item {position}: {field} must be a non-negative number'
+    return None
+
+def bill_totals_error(totals):
+    # Checked on compute_bill_totals() output, once the subtotal is known
+    if totals['discount'] > totals['subtotal']:
+        return 'discount must not exceed the subtotal'
+    if totals['advance'] > totals['total']:
+        return 'advance must not exceed the total'
+    return None
+
+def build_bill_document(data, customer, current_user, bill_no: int, blobs: dict, totals: dict,
+                        created_at=None) -> dict:
+    now = datetime.now()
+    return {
+        'customer_id': customer['_id'],
+        'customer_name': data.get('customer_name', customer['name']),
+        'customer_phone': data.get('customer_phone', customer.get('phone', '')),
+        'customer_address': data.get('customer_address', customer.get('address', '')),
+        # items, subtotal, discount, total, advance and balance
+        **totals,
+        'due_date': data.get('due_date', ''),
+        'special_instructions': data.get('special_instructions', ''),
+        **blobs,
+        'status': data.get('status', 'pending'),
+        'created_by': str(current_user['_id']),
+        'created_at': created_at or now,
+        'updated_at': now,
+        # New fields for sequential bill number
+        'bill_no': int(bill_no),
+        'bill_no_str': format_bill_no(bill_no, 3),
+    }
+
+# Utility: Keep summaries, rollups and dashboard counters in step with new bills
+def record_new_bills(bills):
+    if not bills:
+        return
+    apply_customer_summaries(bills)
+    apply_daily_rollups(bills)
+    bump_dashboard_counters(total_bills=len(bills), total_revenue=sum(bill['total'] for bill in bills))
+    days = {}
+    for bill in bills:
+        day = bill['created_at'].replace(hour=0, minute=0, second=0, microsecond=0)
+        days[day] = days.get(day, 0) + 1
+    for day, count in days.items():
+        bump_day_bills(day, count)
+    bump_list_version('bills')
+
+# Utility: Map a bill detail ?fields= list onto a Mongo projection. Item
+# lines, drawings and the signature are the heavy parts of a bill, so they
+# are only returned when asked for by name (or with fields=all).
+BILL_FIELDS = [
+    'bill_no', 'bill_no_str', 'customer_id', 'customer_name', 'customer_phone', 'customer_address',
+    'items', 'subtotal', 'discount', 'total', 'advance', 'balance', 'due_date',
+    'special_instructions', 'design_images', 'drawings', 'signature', 'status',
+    'created_by', 'created_at', 'updated_at'
+]
+BILL_DETAIL_EXCLUDED_FIELDS = {'items', 'drawings', 'signature'}
+
+def bill_detail_projection(fields_param) -> dict:
+    if not fields_param:
+        return {field: 1 for field in BILL_FIELDS if field not in BILL_DETAIL_EXCLUDED_FIELDS}
+    if fields_param == 'all':
+        return {field: 1 for field in BILL_FIELDS}
+    
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in BILL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown bill fields: {', '.join(unknown)}")
+    return {field: 1 for field in fields}
+
+# Utility: Batched customer lookup for list endpoints
+def fetch_customers_by_ids(customer_ids) -> dict:
+    ids = {cid for cid in customer_ids if isinstance(cid, ObjectId)}
+    if not ids or customers_collection is None:
+        return {}
+
+    customers = customers_collection.find({'_id': {'$in': list(ids)}}, {'name': 1, 'phone': 1})
+    return {
+        customer['_id']: {
+            '_id': customer['_id'],
+            'name': customer.get('name', 'Unknown'),
+            'phone': customer.get('phone', 'N/A')
+        }
+        for customer in customers
+    }
+
+# Utility: Conditional GET. Clients revalidate with If-None-Match and get a
+# 304 with no body when nothing changed; cached payloads keep their ETag so
+# the check happens before Mongo is queried or anything is serialized.
+def make_etag(*parts) -> str:
+    return hashlib.sha1(app.json.dumps(parts).encode('utf-8')).hexdigest()[:24]
+
+def not_modified(etag: str):
+    if request.method != 'GET' or not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def conditional_json(payload, etag: str = None):
+    # Without a precomputed ETag the body itself is hashed; it is encoded once
+    # either way and reused as the response body
+    body = None
+    if etag is None:
+        body = app.json.dumps(payload)
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()[:24]
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    if body is None:
+        body = app.json.dumps(payload)
+    response = app.response_class(body + '\n', mimetype=app.json.mimetype)
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Utility: Per-collection write versions in the counters collection. Every
+# write that changes what a list shows bumps its collection's version (after
+# the write, so a page read under the old version is never tagged with the
+# new one). List ETags come from the versions plus the query string, so a
+# revalidation costs one counters read instead of the page query, the count
+# and the serialization.
+LIST_VERSION_PREFIX = 'list_version:'
+
+def bump_list_version(*names):
+    if counters_collection is None:
+        return
+    counters_collection.bulk_write([
+        UpdateOne({'_id': LIST_VERSION_PREFIX + name}, {'$inc': {'version': 1}}, upsert=True)
+        for name in names
+    ], ordered=False)
+
+def list_etag(*names):
+    # None without the counters collection; conditional_json then hashes the body
+    if counters_collection is None:
+        return None
+    ids = [LIST_VERSION_PREFIX + name for name in names]
+    versions = {doc['_id']: doc.get('version', 0)
+                for doc in counters_collection.find({'_id': {'$in': ids}}, {'version': 1})}
+    return make_etag(request.path, sorted(request.args.items(multi=True)),
+                     [versions.get(version_id, 0) for version_id in ids])
+
+def list_not_modified(*names):
+    # Returns (etag, 304 response or None) for a list depending on these collections
+    etag = list_etag(*names)
+    return etag, (not_modified(etag) if etag is not None else None)
+
+# Dashboard stats are polled by every open dashboard; serve them from a short
+# cache that writes clear. Once an entry expires it is still served for up to
+# DASHBOARD_STALE_SECONDS while a single background refresh replaces it.
+# The cache is per process: every bill or job write clears it, and going
+# through the shared L2 would take its write lock each time. Other workers
+# pick the change up when their copy expires, DASHBOARD_CACHE_SECONDS later.
+DASHBOARD_CACHE_SECONDS = int(os.getenv('DASHBOARD_CACHE_SECONDS', '5'))
+DASHBOARD_STALE_SECONDS = int(os.getenv('DASHBOARD_STALE_SECONDS', '30'))
+dashboard_cache = cache_namespace('dashboard', maxsize=4, ttl=DASHBOARD_CACHE_SECONDS,
+                                  stale_ttl=DASHBOARD_STALE_SECONDS, shared=False)
+
+def clear_dashboard_cache():
+    dashboard_cache.pop('stats')
+
+# Utility: Keyset (cursor) pagination on (created_at, _id)
+def encode_cursor(doc) -> str:
+    created_at = doc.get('created_at')
+    payload = json.dumps({
+        't': created_at.isoformat() if isinstance(created_at, datetime) else None,
+        'id': str(doc['_id'])
+    })
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        created_at = datetime.fromisoformat(payload['t']) if payload['t'] else None
+        return created_at, ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_page(collection, query, projection, limit, cursor):
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        # Documents without created_at (null or missing) sort after every
+        # dated one in this descending order, so a dated cursor still has them ahead
+        after = {
+            '$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': last_id}},
+                {'created_at': None}
+            ]
+        } if created_at is not None else {'created_at': None, '_id': {'$lt': last_id}}
+        query = {'$and': [query, after]} if query else after
+
+    # Over-fetch one row to learn whether another page exists
+    docs = list(collection.find(query, projection)
+                .sort([('created_at', -1), ('_id', -1)])
+                .limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+# Short-lived counts for filtered queries in ``with_total=estimate`` mode
+count_cache = TTLCache(maxsize=256, ttl=30)
+count_cache_lock = threading.Lock()
+
+TOTAL_MODES = ('exact', 'estimate', 'false')
+
+def count_total(collection, query, mode):
+    if mode == 'false':
+        return None
+    if mode == 'exact':
+        return collection.count_documents(query)
+
+    # Unfiltered collections are answered from collection metadata
+    if not query:
+        return collection.estimated_document_count()
+
+    cache_key = (collection.name, json.dumps(query, sort_keys=True, default=str))
+    with count_cache_lock:
+        total = count_cache.get(cache_key)
+    if total is None:
+        total = collection.count_documents(query)
+        with count_cache_lock:
+            count_cache[cache_key] = total
+    return total
+
+# Utility: Shared pagination for list endpoints. Passing ``cursor`` (empty for
+# the first page) switches from page/skip mode to keyset mode, and
+# ``with_total`` selects how (or whether) the total is counted.
+def paginate(collection, query, projection, total_key, sort=None):
+    limit = min(int(request.args.get('limit', 10)), 50)  # Limit max results to 50
+    cursor = request.args.get('cursor')
+    # Keyset pages skip the total unless it is explicitly requested
+    with_total = request.args.get('with_total', 'false' if cursor is not None else 'exact')
+    if with_total not in TOTAL_MODES:
+        raise ValueError(f"with_total must be one of: {', '.join(TOTAL_MODES)}")
+
+    if cursor is not None:
+        docs, next_cursor = keyset_page(collection, query, projection, limit, cursor)
+        pagination = {
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+        if with_total != 'false':
+            pagination[total_key] = count_total(collection, query, with_total)
+        return docs, pagination
+
+    page = int(request.args.get('page', 1))
+    skip = (page - 1) * limit
+    # Over-fetch one row when has_next cannot be derived from an exact total
+    fetch = limit if with_total == 'exact' else limit + 1
+    docs = list(collection.find(query, projection)
+                .skip(skip)
+                .limit(fetch)
+                .sort(sort or [('created_at', -1)]))
+    total = count_total(collection, query, with_total)
+
+    if with_total == 'exact':
+        has_next = skip + limit < total
+    else:
+        has_next = len(docs) > limit
+        docs = docs[:limit]
+
+    return docs, {
+        'current_page': page,
+        'total_pages': (total + limit - 1) // limit if total is not None else None,
+        total_key: total,
+        'has_next': has_next,
+        'has_prev': page > 1
+    }
+
+# Process-local tailor directory: tailor id -> {'name', 'phone'}
+# The TTL bounds staleness for edits made through other workers
+tailor_directory = TTLCache(maxsize=1000, ttl=600)
+tailor_directory_lock = threading.Lock()
+
+def resolve_tailors(tailor_ids) -> dict:
+    ids = {tid for tid in tailor_ids if isinstance(tid, ObjectId)}
+    if not ids:
+        return {}
+
+    with tailor_directory_lock:
+        resolved = {tid: tailor_directory[tid] for tid in ids if tid in tailor_directory}
+
+    missing = ids - resolved.keys()
+    if missing and tailors_collection is not None:
+        fetched = {
+            tailor['_id']: {
+                'name': tailor.get('name', ''),
+                'phone': tailor.get('phone', '')
+            }
+            for tailor in tailors_collection.find({'_id': {'$in': list(missing)}}, {'name': 1, 'phone': 1})
+        }
+        with tailor_directory_lock:
+            tailor_directory.update(fetched)
+        resolved.update(fetched)
+
+    return resolved
+
+def invalidate_tailor_directory(tailor_id=None):
+    with tailor_directory_lock:
+        if tailor_id is None:
+            tailor_directory.clear()
+        else:
+            tailor_directory.pop(tailor_id, None)
+
+# Password checks run on a bounded process pool so a login rush cannot pin the
+# request workers; stored hashes with another cost are rehashed to BCRYPT_ROUNDS
+# LOGIN_MAX_FAILURES is counted per worker process, so with N gunicorn workers
+# a username can see up to N times that many failures per window
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=int(os.getenv('BCRYPT_WORKERS', '2')),
+    max_pending=int(os.getenv('BCRYPT_MAX_PENDING', '8')),
+    timeout=float(os.getenv('BCRYPT_TIMEOUT_SECONDS', '10')),
+    max_failures=int(os.getenv('LOGIN_MAX_FAILURES', '5')),
+    failure_window=int(os.getenv('LOGIN_FAILURE_WINDOW_SECONDS', '60'))
+)
+
 # Initialize default admin user
 def init_default_user():
     if users_collection is None:
@@ -225,7 +1284,7 @@ def init_default_user():
     for username, pwd, role in defaults:
         exists = users_collection.find_one({'username': username})
         if exists is None:
-            hashed_password = bcrypt.hashpw(pwd.encode('utf-8'), bcrypt.gensalt())
+            hashed_password = bcrypt.hashpw(pwd.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
             user_doc = {
                 'username': username,
                 'password': hashed_password,
@@ -255,18 +1314,13 @@ def login():
         if users_collection is None:
             print("Using demo mode login")
             if username == 'admin' and password == 'admin123':
-                token = jwt.encode({
-                    'user_id': str(ObjectId()),
-                    'username': 'admin',
-                    'role': 'admin',
-                    'exp': datetime.utcnow() + timedelta(hours=24)
-                }, app.config['SECRET_KEY'], algorithm='HS256')
+                demo_user = {'_id': ObjectId(), 'username': 'admin', 'role': 'admin'}
                 
                 return jsonify({
                     'message': 'Login successful (demo mode)',
-                    'token': token,
+                    **issue_tokens(demo_user),
                     'user': {
-                        'id': str(ObjectId()),
+                        'id': str(demo_user['_id']),
                         'username': 'admin',
                         'role': 'admin'
                     }
@@ -275,28 +1329,26 @@ def login():
                 return jsonify({'message': 'Invalid credentials'}), 401
         
         # Use projection to exclude password from initial query
-        user = users_collection.find_one({'username': username}, {'password': 1, 'username': 1, 'role': 1})
-        
-        if user is not None and bcrypt.checkpw(password.encode('utf-8'), user['password']):
-            # Create token without password
-            token = jwt.encode({
-                'user_id': str(user['_id']),
-                'username': user['username'],
-                'role': user['role'],
-                'exp': datetime.utcnow() + timedelta(hours=24)
-            }, app.config['SECRET_KEY'], algorithm='HS256')
+        user = users_collection.find_one({'username': username}, {'password': 1, 'username': 1, 'role': 1, 'disabled': 1})
+        
+        # Unknown usernames still pay for a bcrypt check, so timing does not tell them apart
+        matches, rehashed = password_hasher.verify(username, password,
+                                                   user['password'] if user is not None else None)
+        
+        if matches:
+            if rehashed is not None:
+                # Only replace the hash that was checked, in case it changed meanwhile
+                users_collection.update_one(
+                    {'_id': user['_id'], 'password': user['password']},
+                    {'$set': {'password': rehashed}}
+                )
             
-            # Cache user data
-            cache_key = f"user_{user['_id']}"
-            cache[cache_key] = {
-                '_id': user['_id'],
-                'username': user['username'],
-                'role': user['role']
-            }
+            if user.get('disabled'):
+                return jsonify({'message': 'Account is disabled'}), 403
             
             return jsonify({
                 'message': 'Login successful',
-                'token': token,
+                **issue_tokens(user),
                 'user': {
                     'id': str(user['_id']),
                     'username': user['username'],
@@ -306,6 +1358,10 @@ def login():
         else:
             return jsonify({'message': 'Invalid credentials'}), 401
             
+    except LoginThrottled as e:
+        return jsonify({'message': 'Too many login attempts, try again later'}), 429, {'Retry-After': str(e.retry_after)}
+    except HasherBusy as e:
+        return jsonify({'message': 'Login is busy, try again shortly'}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'message': 'Login failed', 'error': str(e)}), 500
@@ -324,6 +1380,115 @@ def verify_token(current_user):
         }
     }), 200
 
+def refresh_token_reused(claims):
+    # A used refresh token came back, so either the owner or a thief holds a
+    # copy; end every session of the user rather than guess which one is which
+    print(f"⚠️  Refresh token reuse for user {claims['user_id']}, revoking all sessions")
+    token_revocations.revoke_user(claims['user_id'], JWT_REFRESH_TOKEN_EXPIRES)
+    return jsonify({'message': 'Refresh token has already been used'}), 401
+
+@app.route('/api/auth/refresh', methods=['POST', 'OPTIONS'])
+def refresh_tokens():
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        data = request.get_json() or {}
+        refresh_token = data.get('refresh_token')
+        
+        if not refresh_token:
+            return jsonify({'message': 'Refresh token is required'}), 400
+        
+        try:
+            claims = jwt.decode(refresh_token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Refresh token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Refresh token is invalid'}), 401
+        
+        if claims.get('type') != 'refresh':
+            return jsonify({'message': 'Refresh token is invalid'}), 401
+        
+        # A revocation made on another worker a moment ago must already count
+        token_revocations.sync(force=True)
+        if token_revocations.is_token_revoked(claims.get('jti')):
+            return refresh_token_reused(claims)
+        if token_revocations.is_revoked(claims):
+            return jsonify({'message': 'Refresh token has been revoked'}), 401
+        
+        # The user record is read here, once per access token lifetime, so role
+        # changes and disabled accounts take effect at the next refresh
+        if users_collection is None:
+            user = {'_id': claims['user_id'], 'username': 'admin', 'role': 'admin'}
+        else:
+            user = users_collection.find_one({'_id': ObjectId(claims['user_id'])},
+                                             {'username': 1, 'role': 1, 'disabled': 1})
+            if user is None or user.get('disabled'):
+                return jsonify({'message': 'Account is disabled'}), 401
+        
+        # Rotation: each refresh token is honoured once, so a stolen one that
+        # is replayed after the owner refreshed gets rejected
+        if not token_revocations.revoke_token(claims['jti'], claims['exp']):
+            return refresh_token_reused(claims)
+        
+        return jsonify(issue_tokens(user)), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to refresh token', 'error': str(e)}), 500
+
+@app.route('/api/auth/logout', methods=['POST', 'OPTIONS'])
+def logout():
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        # Revokes the refresh token; the access token runs out on its own
+        refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if refresh_token:
+            try:
+                claims = jwt.decode(refresh_token, app.config['SECRET_KEY'], algorithms=['HS256'])
+                if claims.get('type') == 'refresh':
+                    token_revocations.revoke_token(claims['jti'], claims['exp'])
+            except jwt.InvalidTokenError:
+                pass
+        
+        return jsonify({'message': 'Logged out'}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Logout failed', 'error': str(e)}), 500
+
+@app.route('/api/admin/users/<user_id>/revoke-tokens', methods=['POST', 'OPTIONS'])
+@token_required
+def revoke_user_tokens(current_user, user_id):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        if not ObjectId.is_valid(user_id):
+            return jsonify({'message': 'Invalid user ID'}), 400
+        
+        # "disable": true also blocks logging in again; false re-enables
+        disable = (request.get_json(silent=True) or {}).get('disable')
+        if users_collection is not None:
+            if users_collection.find_one({'_id': ObjectId(user_id)}, {'_id': 1}) is None:
+                return jsonify({'message': 'User not found'}), 404
+            if disable is not None:
+                users_collection.update_one({'_id': ObjectId(user_id)}, {'$set': {'disabled': bool(disable)}})
+        
+        # Every access and refresh token issued so far stops working
+        token_revocations.revoke_user(user_id, JWT_REFRESH_TOKEN_EXPIRES)
+        
+        result = {'message': 'Tokens revoked'}
+        if disable is not None:
+            result['disabled'] = bool(disable)
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to revoke tokens', 'error': str(e)}), 500
+
 # Customer Management Routes - Optimized
 @app.route('/api/customers', methods=['GET', 'OPTIONS'])
 @token_required
@@ -345,20 +1510,13 @@ def get_customers(current_user):
                 }
             }), 200
             
+        etag, response = list_not_modified('customers')
+        if response is not None:
+            return response
+        
         search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        limit = min(int(request.args.get('limit', 10)), 50)  # Limit max results to 50
-        skip = (page - 1) * limit
         
-        query = {}
-        if search:
-            query = {
-                '$or': [
-                    {'name': {'$regex': search, '$options': 'i'}},
-                    {'phone': {'$regex': search, '$options': 'i'}},
-                    {'email': {'$regex': search, '$options': 'i'}}
-                ]
-            }
+        query = build_customer_search_query(search)
         
         # Use projection to only fetch necessary fields
         projection = {
@@ -370,35 +1528,24 @@ def get_customers(current_user):
             'updated_at': 1
         }
         
-        customers = list(customers_collection.find(query, projection)
-                          .skip(skip)
-                          .limit(limit)
-                          .sort('_id', -1))
-        total_customers = customers_collection.count_documents(query)
+        customers, pagination = paginate(customers_collection, query, projection,
+                                         'total_customers', sort=[('_id', -1)])
         
+        # Customers from before timestamps were stored get their insert time
+        # from the ObjectId, which keeps the list (and its ETag) stable
         for customer in customers:
-            customer['_id'] = str(customer['_id'])
-            if 'created_at' in customer and customer['created_at']:
-                customer['created_at'] = customer['created_at'].isoformat()
-            else:
-                customer['created_at'] = datetime.now().isoformat()
-            
-            if 'updated_at' in customer and customer['updated_at']:
-                customer['updated_at'] = customer['updated_at'].isoformat()
-            else:
-                customer['updated_at'] = datetime.now().isoformat()
+            if not customer.get('created_at') or not customer.get('updated_at'):
+                inserted_at = customer['_id'].generation_time.astimezone().replace(tzinfo=None)
+                customer['created_at'] = customer.get('created_at') or inserted_at
+                customer['updated_at'] = customer.get('updated_at') or inserted_at
         
-        return jsonify({
+        return conditional_json({
             'customers': customers,
-            'pagination': {
-                'current_page': page,
-                'total_pages': (total_customers + limit - 1) // limit,
-                'total_customers': total_customers,
-                'has_next': skip + limit < total_customers,
-                'has_prev': page > 1
-            }
-        }), 200
+            'pagination': pagination
+        }, etag)
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error in get_customers: {str(e)}")
         return jsonify({'message': 'Failed to get customers', 'error': str(e)}), 500
@@ -442,19 +1589,15 @@ def create_customer(current_user):
             return jsonify({'message': 'Customer with this phone number already exists'}), 409
         
         new_customer = {
-            'name': name,
-            'phone': phone,
-            'email': email,
-            'address': address,
-            'notes': notes,
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
+            **Customer(name, phone, email, address, notes).to_dict(),
+            **customer_search_fields(name, phone, email),
+            **empty_customer_summary()
         }
         
         result = customers_collection.insert_one(new_customer)
-        new_customer['_id'] = str(result.inserted_id)
-        new_customer['created_at'] = new_customer['created_at'].isoformat()
-        new_customer['updated_at'] = new_customer['updated_at'].isoformat()
+        customer_suggest_index.add(str(result.inserted_id), name, phone)
+        bump_dashboard_counters(total_customers=1)
+        bump_list_version('customers')
         
         return jsonify({
             'message': 'Customer created successfully',
@@ -464,6 +1607,192 @@ def create_customer(current_user):
     except Exception as e:
         return jsonify({'message': 'Failed to create customer', 'error': str(e)}), 500
 
+# Customer import - rows are parsed incrementally from CSV or JSON (an array
+# or one object per line) and upserted by normalized phone in bulk batches,
+# so memory use does not grow with the size of the file
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_REPORTED_ERRORS = 200
+IMPORT_FIELDS = ['name', 'phone', 'email', 'address', 'notes']
+JSON_RECORD_SEPARATORS = re.compile(r'[\s\[\],]*')
+
+def iter_csv_records(text):
+    reader = csv.DictReader(text)
+    for record in reader:
+        yield {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+
+def iter_json_records(text, chunk_size: int = 65536):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    while True:
+        # Skip array brackets, commas and whitespace between records
+        pos = JSON_RECORD_SEPARATORS.match(buffer, pos).end()
+        try:
+            if pos == len(buffer):
+                raise ValueError('Need more data')
+            record, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                if pos < len(buffer):
+                    raise ValueError(f'Invalid JSON near: {buffer[pos:pos + 40]!r}')
+                return
+            chunk = text.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+
+def import_customer_fields(record):
+    if not isinstance(record, dict):
+        return None, 'Row must be an object'
+    fields = {field: str(record.get(field) or '').strip() for field in IMPORT_FIELDS}
+    if not fields['name'] or not fields['phone']:
+        return None, 'Name and phone are required'
+    if not normalize_phone(fields['phone']):
+        return None, 'Invalid phone number'
+    return fields, None
+
+def import_customer_update(fields, mode: str) -> dict:
+    now = datetime.now()
+    on_insert = {'phone': fields['phone'], **empty_customer_summary(), 'created_at': now}
+    search_fields = customer_search_fields(fields['name'], '', fields['email'])
+    details = {
+        'name': fields['name'],
+        'name_lower': search_fields['name_lower'],
+        'name_words': search_fields['name_words'],
+        'email': fields['email'] or None,
+        'email_lower': search_fields['email_lower'],
+        'address': fields['address'] or None,
+        'notes': fields['notes'] or None,
+        'updated_at': now
+    }
+    if mode == 'skip':
+        return {'$setOnInsert': {**on_insert, **details}}
+    # Blank optional columns never overwrite what is already stored
+    details = {key: value for key, value in details.items() if value is not None}
+    return {'$set': details, '$setOnInsert': on_insert}
+
+def import_customers(records, mode: str) -> dict:
+    summary = {'processed': 0, 'inserted': 0, 'updated': 0, 'duplicates': 0, 'failed': 0,
+               'errors': [], 'errors_truncated': False, 'aborted': False}
+
+    def report(row, message, counter='failed'):
+        summary[counter] += 1
+        if len(summary['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+            summary['errors'].append({'row': row, 'message': message})
+        else:
+            summary['errors_truncated'] = True
+
+    def flush(batch):
+        if customers_collection is None:
+            summary['inserted'] += len(batch)
+            return
+        operations = [
+            UpdateOne({'phone_digits': normalize_phone(fields['phone'])},
+                      import_customer_update(fields, mode), upsert=True)
+            for _, fields in batch
+        ]
+        try:
+            result = customers_collection.bulk_write(operations, ordered=False)
+            upserted, write_errors = result.upserted_ids, {}
+        except BulkWriteError as e:
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+            write_errors = {error['index']: error for error in e.details.get('writeErrors', [])}
+
+        matched_phones = []
+        for index, (row, fields) in enumerate(batch):
+            if index in write_errors:
+                error = write_errors[index]
+                report(row, 'Phone number already exists' if error.get('code') == 11000
+                       else error.get('errmsg', 'Write failed'))
+            elif index in upserted:
+                summary['inserted'] += 1
+                customer_suggest_index.add(str(upserted[index]), fields['name'], fields['phone'])
+            elif mode == 'skip':
+                report(row, 'Customer with this phone number already exists', 'duplicates')
+            else:
+                summary['updated'] += 1
+                matched_phones.append(normalize_phone(fields['phone']))
+
+        # Updated names have to reach the suggest index too
+        if matched_phones:
+            for customer in customers_collection.find({'phone_digits': {'$in': matched_phones}},
+                                                      {'name': 1, 'phone': 1}):
+                customer_suggest_index.add(str(customer['_id']), customer.get('name'), customer.get('phone'))
+
+    batch, batch_phones = [], set()
+    records = iter(records)
+    row = 0
+    while True:
+        row += 1
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # Rows before a malformed section are still imported
+            report(row, f'Could not parse file: {e}')
+            summary['aborted'] = True
+            break
+        summary['processed'] += 1
+        fields, error = import_customer_fields(record)
+        if error:
+            report(row, error)
+            continue
+        digits = normalize_phone(fields['phone'])
+        if digits in batch_phones:
+            report(row, 'Duplicate phone number in file', 'duplicates')
+            continue
+        batch.append((row, fields))
+        batch_phones.add(digits)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush(batch)
+            batch, batch_phones = [], set()
+    if batch:
+        flush(batch)
+
+    bump_dashboard_counters(total_customers=summary['inserted'])
+    if summary['inserted'] or summary['updated']:
+        bump_list_version('customers')
+    return summary
+
+@app.route('/api/customers/import', methods=['POST', 'OPTIONS'])
+@token_required
+def import_customers_route(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+    
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        mode = request.args.get('mode', 'upsert')
+        if mode not in ('upsert', 'skip'):
+            return jsonify({'message': 'mode must be upsert or skip'}), 400
+        
+        # A multipart upload (spooled to disk by werkzeug) or the raw request body
+        upload = request.files.get('file')
+        stream = upload.stream if upload is not None else request.stream
+        filename = (upload.filename or '') if upload is not None else ''
+        content_type = (upload.mimetype if upload is not None else request.mimetype) or ''
+        
+        import_format = request.args.get('format', '').lower()
+        if not import_format:
+            is_json = filename.lower().endswith(('.json', '.ndjson', '.jsonl')) or 'json' in content_type
+            import_format = 'json' if is_json else 'csv'
+        if import_format not in ('csv', 'json'):
+            return jsonify({'message': 'format must be csv or json'}), 400
+        
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        records = iter_json_records(text) if import_format == 'json' else iter_csv_records(text)
+        summary = import_customers(records, mode)
+        
+        return jsonify({'message': 'Customer import finished', 'mode': mode, **summary}), 200
+        
+    except RequestEntityTooLarge as e:
+        return request_too_large(e)
+    except Exception as e:
+        return jsonify({'message': 'Failed to import customers', 'error': str(e)}), 500
+
 @app.route('/api/customers/<customer_id>', methods=['GET', 'OPTIONS'])
 @token_required
 def get_customer_by_id(current_user, customer_id):
@@ -494,31 +1823,25 @@ def get_customer_by_id(current_user, customer_id):
         if customer is None:
             return jsonify({'message': 'Customer not found'}), 404
         
-        customer['_id'] = str(customer['_id'])
-        if 'created_at' in customer and customer['created_at']:
-            customer['created_at'] = customer['created_at'].isoformat()
-        if 'updated_at' in customer and customer['updated_at']:
-            customer['updated_at'] = customer['updated_at'].isoformat()
-        
         # Get customer's bills with projection for performance
+        include_bills = request.args.get('include_bills', 'true').lower() != 'false'
         bills = []
-        if bills_collection is not None:
+        if bills_collection is not None and (include_bills or 'order_count' not in customer):
             bills = list(bills_collection.find(
                 {'customer_id': ObjectId(customer_id)},
-                {'total': 1, 'balance': 1, 'status': 1, 'created_at': 1, 'bill_no_str': 1}
+                {'customer_id': 1, 'total': 1, 'balance': 1, 'status': 1, 'created_at': 1, 'bill_no_str': 1}
             ))
-            for bill in bills:
-                bill['_id'] = str(bill['_id'])
-                bill['customer_id'] = str(bill['customer_id'])
-                if 'created_at' in bill and bill['created_at']:
-                    bill['created_at'] = bill['created_at'].isoformat()
-                if 'updated_at' in bill and bill['updated_at']:
-                    bill['updated_at'] = bill['updated_at'].isoformat()
-        
-        customer['bills'] = bills
-        customer['total_orders'] = len(bills)
-        customer['total_spent'] = sum(bill.get('total', 0) for bill in bills)
-        customer['outstanding_balance'] = sum(bill.get('balance', 0) for bill in bills if bill.get('status') == 'pending')
+        
+        if include_bills:
+            customer['bills'] = bills
+        
+        # Prefer the materialized summary; older documents are summed from their bills
+        if 'order_count' in customer:
+            customer['total_orders'] = customer.pop('order_count')
+        else:
+            customer['total_orders'] = len(bills)
+            customer['total_spent'] = sum(bill.get('total', 0) for bill in bills)
+            customer['outstanding_balance'] = sum(outstanding_of(bill) for bill in bills)
         
         return jsonify({'customer': customer}), 200
         
@@ -563,6 +1886,7 @@ def update_customer(current_user, customer_id):
             'notes': data.get('notes', customer.get('notes')),
             'updated_at': datetime.now()
         }
+        update_data.update(customer_search_fields(update_data['name'], update_data['phone'], update_data['email']))
         
         result = customers_collection.update_one(
             {'_id': ObjectId(customer_id)},
@@ -572,10 +1896,9 @@ def update_customer(current_user, customer_id):
         if result.modified_count == 0:
             return jsonify({'message': 'No changes made'}), 200
         
+        bump_list_version('customers')
         updated_customer = customers_collection.find_one({'_id': ObjectId(customer_id)})
-        updated_customer['_id'] = str(updated_customer['_id'])
-        updated_customer['created_at'] = updated_customer['created_at'].isoformat()
-        updated_customer['updated_at'] = updated_customer['updated_at'].isoformat()
+        customer_suggest_index.add(customer_id, updated_customer.get('name'), updated_customer.get('phone'))
         
         return jsonify({
             'message': 'Customer updated successfully',
@@ -601,15 +1924,134 @@ def delete_customer(current_user, customer_id):
         if result.deleted_count == 0:
             return jsonify({'message': 'Customer not found'}), 404
         
-        # Also delete associated bills
+        customer_suggest_index.remove(customer_id)
+        
+        # Also delete associated bills, taking them off the counters and rollups
+        bills = []
         if bills_collection is not None:
+            bills = list(bills_collection.find(
+                {'customer_id': ObjectId(customer_id)},
+                {'total': 1, 'discount': 1, 'advance': 1, 'balance': 1, 'status': 1, 'created_at': 1}
+            ))
             bills_collection.delete_many({'customer_id': ObjectId(customer_id)})
+            bills = [bill for bill in bills if isinstance(bill.get('created_at'), datetime)]
+            apply_daily_rollups(bills, -1)
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        bump_day_bills(today, -sum(1 for bill in bills if bill['created_at'] >= today))
+        bump_dashboard_counters(
+            total_customers=-1,
+            total_bills=-len(bills),
+            total_revenue=-sum(bill.get('total', 0) for bill in bills)
+        )
+        bump_list_version('customers', 'bills')
         
         return jsonify({'message': 'Customer deleted successfully'}), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to delete customer', 'error': str(e)}), 500
 
+@app.route('/api/customers/suggest', methods=['GET', 'OPTIONS'])
+@token_required
+def suggest_customers(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        q = request.args.get('q', '').strip()
+        limit = min(int(request.args.get('limit', 10)), 25)
+        
+        if not q:
+            return jsonify({'customers': [], 'source': 'index'}), 200
+        
+        # Serve from memory once the index is complete; otherwise use the database
+        if customer_suggest_index.ready and not customer_suggest_index.over_budget:
+            return jsonify({
+                'customers': customer_suggest_index.search(q, limit),
+                'source': 'index'
+            }), 200
+        
+        if customers_collection is None:
+            return jsonify({'customers': [], 'source': 'database'}), 200
+        
+        customers = list(customers_collection.find(
+            build_customer_search_query(q), {'name': 1, 'phone': 1}
+        ).limit(limit))
+        
+        return jsonify({'customers': customers, 'source': 'database'}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to suggest customers', 'error': str(e)}), 500
+
+@app.route('/api/admin/cache/stats', methods=['GET', 'OPTIONS'])
+@token_required
+def cache_stats(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        # Counters are per worker; the pid says which one answered
+        return jsonify({
+            'pid': os.getpid(),
+            'namespaces': {name: namespace.stats() for name, namespace in cache_namespaces.items()},
+            'tokens': token_cache.stats(),
+            'revocations': token_revocations.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get cache stats', 'error': str(e)}), 500
+
+@app.route('/api/admin/customers/backfill-search', methods=['POST', 'OPTIONS'])
+@token_required
+def backfill_customer_search(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        updated = backfill_customer_search_fields()
+        return jsonify({'message': 'Customer search fields backfilled', 'updated': updated}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to backfill customer search fields', 'error': str(e)}), 500
+
+@app.route('/api/admin/bills/offload-blobs', methods=['POST', 'OPTIONS'])
+@token_required
+def offload_bill_blobs_route(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        migrated = offload_existing_bill_blobs()
+        return jsonify({'message': 'Bill blobs offloaded', 'migrated': migrated}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to offload bill blobs', 'error': str(e)}), 500
+
+@app.route('/api/admin/customers/rebuild-summaries', methods=['POST', 'OPTIONS'])
+@token_required
+def rebuild_customer_summaries_route(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
+        
+        reconciled = rebuild_customer_summaries()
+        return jsonify({'message': 'Customer summaries rebuilt', 'reconciled': reconciled}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to rebuild customer summaries', 'error': str(e)}), 500
+
 @app.route('/api/customers/stats', methods=['GET', 'OPTIONS'])
 @token_required
 def get_customer_stats(current_user):
@@ -627,48 +2069,26 @@ def get_customer_stats(current_user):
             
         total_customers = customers_collection.count_documents({})
         
-        # Count customers with outstanding balances using aggregation for better performance
-        pipeline = [
-            {
-                '$lookup': {
-                    'from': 'bills',
-                    'localField': '_id',
-                    'foreignField': 'customer_id',
-                    'as': 'bills'
-                }
-            },
-            {
-                '$match': {
-                    'bills.status': 'pending',
-                    'bills.balance': {'$gt': 0}
-                }
-            },
-            {
-                '$count': 'count'
-            }
-        ]
-        
-        outstanding_result = list(customers_collection.aggregate(pipeline))
-        customers_with_outstanding = outstanding_result[0]['count'] if outstanding_result else 0
-        
-        # Calculate total outstanding amount
+        # Read the materialized summaries; the outstanding_balance index keeps
+        # this to the customers that actually owe money
         pipeline = [
             {
                 '$match': {
-                    'status': 'pending',
-                    'balance': {'$gt': 0}
+                    'outstanding_balance': {'$gt': 0}
                 }
             },
             {
                 '$group': {
                     '_id': None,
-                    'total_outstanding': {'$sum': '$balance'}
+                    'count': {'$sum': 1},
+                    'total_outstanding': {'$sum': '$outstanding_balance'}
                 }
             }
         ]
         
-        outstanding_amount_result = list(bills_collection.aggregate(pipeline)) if bills_collection is not None else []
-        total_outstanding_amount = outstanding_amount_result[0]['total_outstanding'] if outstanding_amount_result else 0
+        outstanding_result = list(customers_collection.aggregate(pipeline))
+        customers_with_outstanding = outstanding_result[0]['count'] if outstanding_result else 0
+        total_outstanding_amount = outstanding_result[0]['total_outstanding'] if outstanding_result else 0
         
         return jsonify({
             'total_customers': total_customers,
@@ -700,43 +2120,12 @@ def get_bills(current_user):
                 }
             }), 200
             
-        search = request.args.get('search', '')
-        status = request.args.get('status', '')
-        customer_id = request.args.get('customer_id', '')
-        page = int(request.args.get('page', 1))
-        limit = min(int(request.args.get('limit', 10)), 50)  # Limit max results
-        skip = (page - 1) * limit
+        # The page joins customer names and phones, so customer writes count too
+        etag, response = list_not_modified('bills', 'customers')
+        if response is not None:
+            return response
         
-        query = {}
-        
-        if search:
-            # Use text search if indexes are available, otherwise use regex
-            try:
-                # First try to find customer by ID for exact matches
-                if ObjectId.is_valid(search):
-                    query['customer_id'] = ObjectId(search)
-                else:
-                    # Use text search or fallback to regex
-                    customers = customers_collection.find({
-                        '$or': [
-                            {'name': {'$regex': search, '$options': 'i'}},
-                            {'phone': {'$regex': search, '$options': 'i'}}
-                        ]
-                    }, {'_id': 1}).limit(10)
-                    customer_ids = [customer['_id'] for customer in customers]
-                    if customer_ids:
-                        query['customer_id'] = {'$in': customer_ids}
-            except Exception as e:
-                print(f"Search optimization error: {str(e)}")
-        
-        if status:
-            query['status'] = status
-        
-        if customer_id:
-            try:
-                query['customer_id'] = ObjectId(customer_id)
-            except:
-                return jsonify({'message': 'Invalid customer ID format'}), 400
+        query = build_bills_query(request.args)
         
         # Use projection to only fetch necessary fields
         projection = {
@@ -747,53 +2136,44 @@ def get_bills(current_user):
             'balance': 1,
             'status': 1,
             'created_at': 1,
-            'bill_no_str': 1
+            'bill_no_str': 1,
+            # Only the first design image, shown as a thumbnail in the list
+            'design_images': {'$slice': 1}
         }
         
-        bills = list(bills_collection.find(query, projection)
-                      .skip(skip)
-                      .limit(limit)
-                      .sort('created_at', -1))
-        total_bills = bills_collection.count_documents(query)
+        bills, pagination = paginate(bills_collection, query, projection, 'total_bills')
         
+        # Fetch every customer on the page in a single round trip
+        customer_map = fetch_customers_by_ids(bill.get('customer_id') for bill in bills)
+
         formatted_bills = []
-        customer_cache = {}
-        
+
         for bill in bills:
             try:
-                bill['_id'] = str(bill['_id'])
-                bill['customer_id'] = str(bill['customer_id'])
-                bill['created_at'] = bill['created_at'].isoformat()
-                
-                # Cache customer data to avoid multiple lookups
-                customer_key = bill['customer_id']
-                if customer_key not in customer_cache:
-                    customer = customers_collection.find_one(
-                        {'_id': ObjectId(bill['customer_id'])},
-                        {'name': 1, 'phone': 1}
-                    )
-                    customer_cache[customer_key] = customer if customer else {
-                        'name': 'Unknown',
-                        'phone': 'N/A'
+                customer = customer_map.get(bill.get('customer_id'))
+                if customer is None:
+                    # Fall back to the details denormalized onto the bill
+                    customer = {
+                        '_id': bill.get('customer_id'),
+                        'name': bill.get('customer_name') or 'Unknown',
+                        'phone': bill.get('customer_phone') or 'N/A'
                     }
-                
-                bill['customer'] = customer_cache[customer_key]
+
+                bill['customer'] = customer
+                first_image = with_blob_url((bill.pop('design_images', None) or [None])[0])
+                bill['thumbnail_url'] = first_image.get('thumbnail_url') if isinstance(first_image, dict) else None
                 formatted_bills.append(bill)
             except Exception as e:
                 print(f"Error formatting bill: {str(e)}")
                 continue
         
-        return jsonify({
+        return conditional_json({
             'bills': formatted_bills,
-            'pagination': {
-                'current_page': page,
-                'total_pages': (total_bills + limit - 1) // limit,
-                'total_bills': total_bills,
-                'has_next': skip + limit < total_bills,
-                'has_prev': page > 1
-            }
-        }), 200
+            'pagination': pagination
+        }, etag)
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error in get_bills: {str(e)}")
         return jsonify({
@@ -810,8 +2190,7 @@ def create_bill(current_user):
     try:
         data = request.get_json()
         
-        required_fields = ['customer_id', 'customer_name', 'items']
-        for field in required_fields:
+        for field in BILL_REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({'message': f'Missing required field: {field}'}), 400
 
@@ -851,65 +2230,383 @@ def create_bill(current_user):
             }), 201
 
         try:
-            customer_id = ObjectId(data['customer_id'])
+            customer_id = ObjectId(data['customer_id'])
+        except:
+            return jsonify({'message': 'Invalid customer ID format'}), 400
+            
+        customer = customers_collection.find_one({'_id': customer_id})
+        if customer is None:
+            return jsonify({'message': 'Customer not found'}), 404
+
+        error = bill_payload_error(data)
+        if error:
+            return jsonify({'message': error}), 400
+        
+        totals = compute_bill_totals([data])[0]
+        error = bill_totals_error(totals)
+        if error:
+            return jsonify({'message': error}), 400
+
+        # Store images, drawings and the signature as blobs before reserving a number
+        blobs = offload_bill_blobs(data)
+
+        # Generate sequential bill number
+        next_no = get_next_sequence('bill_no')
+
+        new_bill = build_bill_document(data, customer, current_user, next_no, blobs, totals)
+
+        try:
+            result = bills_collection.insert_one(new_bill)
+        except Exception:
+            release_sequence_block('bill_no', next_no)
+            raise
+        record_new_bills([new_bill])
+        expand_bill_blobs(new_bill)
+
+        return jsonify({
+            'message': 'Bill created successfully',
+            'bill': new_bill
+        }), 201
+        
+    except Exception as e:
+        print(f"Error creating bill: {str(e)}")
+        return jsonify({
+            'message': 'Failed to create bill',
+            'error': str(e),
+            'received_data': data
+        }), 500
+
+# Bulk bill creation for syncing bills entered offline: one $in customer
+# lookup, one bill-number reservation and one unordered insert_many
+BULK_BILLS_MAX = int(os.getenv('BULK_BILLS_MAX', '500'))
+# Offline bills may carry the time they were entered as created_at, so they
+# land on the right day in rollups and lists; it has to fall within the last
+# BULK_BILL_MAX_AGE_DAYS and no further ahead than the allowed clock skew
+BULK_BILL_MAX_AGE_DAYS = int(os.getenv('BULK_BILL_MAX_AGE_DAYS', '30'))
+BULK_BILL_CLOCK_SKEW_SECONDS = int(os.getenv('BULK_BILL_CLOCK_SKEW_SECONDS', '300'))
+
+def parse_client_created_at(value) -> datetime:
+    # ISO 8601; times with an offset are converted to the server's local time,
+    # which is what every other created_at is stored in
+    if not isinstance(value, str):
+        raise ValueError('created_at must be an ISO 8601 string')
+    try:
+        created_at = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        raise ValueError('created_at must be an ISO 8601 string')
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone().replace(tzinfo=None)
+    now = datetime.now()
+    if created_at > now + timedelta(seconds=BULK_BILL_CLOCK_SKEW_SECONDS):
+        raise ValueError('created_at must not be in the future')
+    if created_at < now - timedelta(days=BULK_BILL_MAX_AGE_DAYS):
+        raise ValueError(f'created_at must be within the last {BULK_BILL_MAX_AGE_DAYS} days')
+    return min(created_at, now)
+
+@app.route('/api/bills/bulk', methods=['POST', 'OPTIONS'])
+@token_required
+def create_bills_bulk(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        payload = request.get_json(silent=True) or {}
+        entries = payload.get('bills')
+        if not isinstance(entries, list) or len(entries) == 0:
+            return jsonify({'message': 'bills must be a non-empty array'}), 400
+        if len(entries) > BULK_BILLS_MAX:
+            return jsonify({'message': f'At most {BULK_BILLS_MAX} bills per request'}), 400
+        
+        results = [{'index': index} for index in range(len(entries))]
+        for result, data in zip(results, entries):
+            if isinstance(data, dict) and 'client_ref' in data:
+                result['client_ref'] = data['client_ref']
+        
+        # Validate every payload before touching the database
+        valid = []
+        created_times = {}
+        for index, data in enumerate(entries):
+            error = bill_payload_error(data)
+            if error is None and data.get('created_at') is not None:
+                try:
+                    created_times[index] = parse_client_created_at(data['created_at'])
+                except ValueError as e:
+                    error = str(e)
+            if error is None:
+                try:
+                    valid.append((index, data, ObjectId(data['customer_id'])))
+                    continue
+                except Exception:
+                    error = 'Invalid customer ID format'
+            results[index].update({'status': 'error', 'message': error})
+        
+        # For development when DB is not available
+        if bills_collection is None:
+            for bill_no, (index, data, customer_id) in enumerate(valid, start=1):
+                results[index].update({'status': 'created', '_id': str(ObjectId()),
+                                       'bill_no': bill_no, 'bill_no_str': format_bill_no(bill_no, 3)})
+            return jsonify({'message': 'Bills processed (demo mode)', 'created': len(valid),
+                            'failed': len(entries) - len(valid), 'results': results}), 200
+        
+        customers = {
+            customer['_id']: customer
+            for customer in customers_collection.find(
+                {'_id': {'$in': list({customer_id for _, _, customer_id in valid})}},
+                {'name': 1, 'phone': 1, 'address': 1}
+            )
+        }
+        found = []
+        for index, data, customer_id in valid:
+            if customer_id in customers:
+                found.append((index, data, customers[customer_id]))
+            else:
+                results[index].update({'status': 'error', 'message': 'Customer not found'})
+        
+        ready = []
+        for (index, data, customer), totals in zip(found, compute_bill_totals([data for _, data, _ in found])):
+            error = bill_totals_error(totals)
+            if error is None:
+                ready.append((index, data, customer, totals))
+            else:
+                results[index].update({'status': 'error', 'message': error})
+        
+        new_bills = []
+        if ready:
+            # Numbers are handed out in request order from one contiguous block
+            first_no = reserve_sequence_block('bill_no', len(ready))
+            new_bills = [
+                (index, build_bill_document(data, customer, current_user, first_no + offset,
+                                            offload_bill_blobs(data), totals, created_times.get(index)))
+                for offset, (index, data, customer, totals) in enumerate(ready)
+            ]
+            
+            failed_positions = {}
+            try:
+                bills_collection.insert_many([bill for _, bill in new_bills], ordered=False)
+            except BulkWriteError as e:
+                failed_positions = {error['index']: error.get('errmsg', 'Insert failed')
+                                    for error in e.details.get('writeErrors', [])}
+                if len(failed_positions) == len(new_bills):
+                    release_sequence_block('bill_no', first_no, len(new_bills))
+            
+            inserted = []
+            for position, (index, bill) in enumerate(new_bills):
+                if position in failed_positions:
+                    results[index].update({'status': 'error', 'message': failed_positions[position]})
+                    continue
+                inserted.append(bill)
+                results[index].update({'status': 'created', '_id': str(bill['_id']),
+                                       'bill_no': bill['bill_no'], 'bill_no_str': bill['bill_no_str']})
+            new_bills = inserted
+        
+        record_new_bills(new_bills)
+        
+        return jsonify({
+            'message': 'Bills processed',
+            'created': len(new_bills),
+            'failed': len(entries) - len(new_bills),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to create bills', 'error': str(e)}), 500
+
+@app.route('/api/bills/<bill_id>', methods=['GET', 'OPTIONS'])
+@token_required
+def get_bill_by_id(current_user, bill_id):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        projection = bill_detail_projection(request.args.get('fields', ''))
+        
+        # For development when DB is not available
+        if bills_collection is None:
+            demo_bill = {
+                '_id': bill_id,
+                'bill_no': 1,
+                'bill_no_str': format_bill_no(1, 3),
+                'customer_name': 'Demo Customer',
+                'items': [],
+                'total': 0,
+                'balance': 0,
+                'status': 'pending',
+                'created_at': datetime.now().isoformat()
+            }
+            return jsonify({'bill': {key: value for key, value in demo_bill.items()
+                                     if key == '_id' or key in projection}}), 200
+        
+        try:
+            bill_object_id = ObjectId(bill_id)
+        except Exception:
+            return jsonify({'message': 'Invalid bill ID format'}), 400
+        
+        bill = bills_collection.find_one({'_id': bill_object_id}, projection)
+        if bill is None:
+            return jsonify({'message': 'Bill not found'}), 404
+        
+        expand_bill_blobs(bill)
+        
+        return jsonify({'bill': bill}), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch bill', 'error': str(e)}), 500
+
+@app.route('/api/bills/<bill_id>/status', methods=['PUT', 'OPTIONS'])
+@token_required
+def update_bill_status(current_user, bill_id):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        # For development when DB is not available
+        if bills_collection is None:
+            return jsonify({'message': 'Bill status updated successfully (demo mode)'}), 200
+            
+        data = request.get_json()
+        status = data.get('status')
+        
+        if not status:
+            return jsonify({'message': 'Status is required'}), 400
+        
+        if status not in BILL_STATUSES:
+            return jsonify({'message': 'Invalid status'}), 400
+        
+        try:
+            bill_oid = ObjectId(bill_id)
         except:
-            return jsonify({'message': 'Invalid customer ID format'}), 400
-            
-        customer = customers_collection.find_one({'_id': customer_id})
-        if customer is None:
-            return jsonify({'message': 'Customer not found'}), 404
-
-        if not isinstance(data['items'], list) or len(data['items']) == 0:
-            return jsonify({'message': 'Items must be a non-empty array'}), 400
+            return jsonify({'message': 'Invalid bill ID format'}), 400
+        
+        # Read the previous status atomically so summaries move by the right delta
+        previous = bills_collection.find_one_and_update(
+            {'_id': bill_oid},
+            {
+                '$set': {
+                    'status': status,
+                    'updated_at': datetime.now()
+                }
+            },
+            projection={'customer_id': 1, 'status': 1, 'balance': 1, 'total': 1, 'created_at': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        
+        if previous is None:
+            return jsonify({'message': 'Bill not found'}), 404
+        
+        apply_bill_status_change(previous, status)
+        apply_rollup_status_change(previous, status)
+        bump_list_version('bills')
+        
+        return jsonify({'message': 'Bill status updated successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to update bill status', 'error': str(e)}), 500
 
-        # Generate sequential bill number
-        next_no = get_next_sequence('bill_no')
+# Blob Routes - ids are sha256 content hashes, so responses never change and
+# the route is open for <img> tags, which cannot send the Authorization header.
+# Only raster image types are served inline; anything else is a download, and
+# nosniff stops browsers from guessing a scriptable type from the bytes.
+def blob_response(stream, size: int, content_type: str):
+    response = Response(wrap_file(request.environ, stream), mimetype=content_type, direct_passthrough=True)
+    response.content_length = size
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if content_type == FALLBACK_CONTENT_TYPE:
+        response.headers['Content-Disposition'] = 'attachment'
+    return response
 
-        new_bill = {
-            'customer_id': customer_id,
-            'customer_name': data.get('customer_name', customer['name']),
-            'customer_phone': data.get('customer_phone', customer.get('phone', '')),
-            'customer_address': data.get('customer_address', customer.get('address', '')),
-            'items': data['items'],
-            'subtotal': float(data.get('subtotal', 0)),
-            'discount': float(data.get('discount', 0)),
-            'total': float(data.get('total', 0)),
-            'advance': float(data.get('advance', 0)),
-            'balance': float(data.get('balance', 0)),
-            'due_date': data.get('due_date', ''),
-            'special_instructions': data.get('special_instructions', ''),
-            'design_images': data.get('design_images', []),
-            'drawings': data.get('drawings', []),
-            'signature': data.get('signature', ''),
-            'status': data.get('status', 'pending'),
-            'created_by': str(current_user['_id']),
-            'created_at': datetime.now(),
-            'updated_at': datetime.now(),
-            # New fields for sequential bill number
-            'bill_no': int(next_no),
-            'bill_no_str': format_bill_no(next_no, 3),
-        }
+@app.route('/api/blobs/<blob_id>', methods=['GET'])
+def get_blob(blob_id):
+    if not BLOB_ID_PATTERN.match(blob_id):
+        return jsonify({'message': 'Invalid blob ID'}), 400
+    
+    blob = blob_store.open(blob_id)
+    if blob is None:
+        return jsonify({'message': 'Blob not found'}), 404
+    
+    response = blob_response(*blob)
+    response.set_etag(blob_id)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=response.content_length)
 
-        result = bills_collection.insert_one(new_bill)
-        new_bill['_id'] = str(result.inserted_id)
-        new_bill['customer_id'] = str(new_bill['customer_id'])
-        new_bill['created_at'] = new_bill['created_at'].isoformat()
-        new_bill['updated_at'] = new_bill['updated_at'].isoformat()
+@app.route('/api/blobs/<blob_id>/thumbnail', methods=['GET'])
+def get_blob_thumbnail(blob_id):
+    if not BLOB_ID_PATTERN.match(blob_id):
+        return jsonify({'message': 'Invalid blob ID'}), 400
+    
+    thumbnail_id = blob_store.thumbnail_of(blob_id)
+    if thumbnail_id:
+        return get_blob(thumbnail_id)
+    
+    # Not generated yet (or not an image): serve the original for now, without
+    # letting clients cache it under the thumbnail URL
+    blob = blob_store.open(blob_id)
+    if blob is None:
+        return jsonify({'message': 'Blob not found'}), 404
+    
+    schedule_thumbnail(blob_id, blob[2])
+    response = blob_response(*blob)
+    response.cache_control.no_cache = True
+    return response
 
-        return jsonify({
-            'message': 'Bill created successfully',
-            'bill': new_bill
-        }), 201
+@app.route('/api/blobs', methods=['POST', 'OPTIONS'])
+@token_required
+def upload_blobs(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+    
+    try:
+        # Multipart file uploads, or a JSON body of data URLs. The body size is
+        # capped by MAX_CONTENT_LENGTH.
+        files = []
+        if request.files:
+            for upload in request.files.getlist('file') + request.files.getlist('files'):
+                files.append((upload.read(), upload.mimetype))
+        else:
+            payload = request.get_json(silent=True) or {}
+            for value in payload.get('data_urls') or []:
+                parsed = parse_data_url(value)
+                if parsed is None:
+                    return jsonify({'message': 'Invalid data URL'}), 400
+                files.append(parsed)
+        
+        if not files:
+            return jsonify({'message': 'No files uploaded'}), 400
         
+        # Only raster images are accepted; the declared type is all we have
+        if any(safe_content_type(content_type) == FALLBACK_CONTENT_TYPE for _, content_type in files):
+            return jsonify({'message': 'Only PNG, JPEG, WebP and GIF images can be uploaded'}), 415
+        
+        blobs = [store_blob(data, content_type) for data, content_type in files]
+        return jsonify({'blobs': [with_blob_url(blob) for blob in blobs]}), 201
+        
+    except RequestEntityTooLarge as e:
+        return request_too_large(e)
     except Exception as e:
-        print(f"Error creating bill: {str(e)}")
-        return jsonify({
-            'message': 'Failed to create bill',
-            'error': str(e),
-            'received_data': data
-        }), 500
+        return jsonify({'message': 'Failed to upload files', 'error': str(e)}), 500
 
 # Settings Routes
+def load_upi_settings():
+    # Cached in settings_cache as (payload, etag)
+    settings = None
+    if settings_collection is not None:
+        settings = settings_collection.find_one({'type': 'upi_settings'})
+        
+    if settings is None:
+        result = {
+            'upi_id': 'startailors@paytm',
+            'business_name': 'Star Tailors'
+        }
+    else:
+        result = {
+            'upi_id': settings.get('upi_id', 'startailors@paytm'),
+            'business_name': settings.get('business_name', 'Star Tailors')
+        }
+    return result, make_etag('upi_settings', settings and settings.get('updated_at'), result)
+
 @app.route('/api/settings/upi', methods=['GET', 'OPTIONS'])
 @token_required
 def get_upi_settings(current_user):
@@ -917,30 +2614,7 @@ def get_upi_settings(current_user):
         return jsonify(), 200
         
     try:
-        cache_key = "upi_settings"
-        cached_settings = cache.get(cache_key)
-        
-        if cached_settings:
-            return jsonify(cached_settings), 200
-            
-        settings = None
-        if settings_collection is not None:
-            settings = settings_collection.find_one({'type': 'upi_settings'})
-            
-        if settings is None:
-            result = {
-                'upi_id': 'startailors@paytm',
-                'business_name': 'Star Tailors'
-            }
-            cache[cache_key] = result
-            return jsonify(result), 200
-        
-        result = {
-            'upi_id': settings.get('upi_id', 'startailors@paytm'),
-            'business_name': settings.get('business_name', 'Star Tailors')
-        }
-        cache[cache_key] = result
-        return jsonify(result), 200
+        return conditional_json(*settings_cache.get_or_set('upi_settings', load_upi_settings))
         
     except Exception as e:
         return jsonify({'message': 'Failed to get UPI settings', 'error': str(e)}), 500
@@ -979,7 +2653,7 @@ def update_upi_settings(current_user):
         )
         
         # Clear cache
-        cache.pop("upi_settings", None)
+        settings_cache.pop("upi_settings")
         
         return jsonify({'message': 'UPI settings updated successfully'}), 200
         
@@ -987,41 +2661,36 @@ def update_upi_settings(current_user):
         return jsonify({'message': 'Failed to update UPI settings', 'error': str(e)}), 500
 
 # Business information settings
-@app.route('/api/settings/business', methods=['GET', 'OPTIONS'])
-@token_required
-def get_business_settings(current_user):
-    if request.method == 'OPTIONS':
-        return jsonify(), 200
-    try:
-        cache_key = "business_settings"
-        cached_settings = cache.get(cache_key)
-        
-        if cached_settings:
-            return jsonify(cached_settings), 200
-            
-        settings = None
-        if settings_collection is not None:
-            settings = settings_collection.find_one({'type': 'business_info'})
-            
-        if settings is None:
-            # Defaults
-            result = {
-                'business_name': 'STAR TAILORS',
-                'address': 'Baramati, Maharashtra',
-                'phone': '+91 00000 00000',
-                'email': 'info@startailors.com'
-            }
-            cache[cache_key] = result
-            return jsonify(result), 200
-        
+def load_business_settings():
+    # Cached in settings_cache as (payload, etag)
+    settings = None
+    if settings_collection is not None:
+        settings = settings_collection.find_one({'type': 'business_info'})
+        
+    if settings is None:
+        # Defaults
+        result = {
+            'business_name': 'STAR TAILORS',
+            'address': 'Baramati, Maharashtra',
+            'phone': '+91 00000 00000',
+            'email': 'info@startailors.com'
+        }
+    else:
         result = {
             'business_name': settings.get('business_name', 'STAR TAILORS'),
             'address': settings.get('address', ''),
             'phone': settings.get('phone', ''),
             'email': settings.get('email', '')
         }
-        cache[cache_key] = result
-        return jsonify(result), 200
+    return result, make_etag('business_settings', settings and settings.get('updated_at'), result)
+
+@app.route('/api/settings/business', methods=['GET', 'OPTIONS'])
+@token_required
+def get_business_settings(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+    try:
+        return conditional_json(*settings_cache.get_or_set('business_settings', load_business_settings))
     except Exception as e:
         return jsonify({'message': 'Failed to get business settings', 'error': str(e)}), 500
 
@@ -1053,7 +2722,7 @@ def update_business_settings(current_user):
         )
         
         # Clear cache
-        cache.pop("business_settings", None)
+        settings_cache.pop("business_settings")
         
         return jsonify({'message': 'Business settings updated successfully'}), 200
     except Exception as e:
@@ -1080,10 +2749,11 @@ def get_tailors(current_user):
                 }
             }), 200
             
+        etag, response = list_not_modified('tailors')
+        if response is not None:
+            return response
+        
         search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        limit = min(int(request.args.get('limit', 10)), 50)
-        skip = (page - 1) * limit
         
         query = {}
         if search:
@@ -1103,28 +2773,19 @@ def get_tailors(current_user):
             'specialization': 1,
             'experience': 1,
             'status': 1,
-            'created_at': 1
+            'created_at': 1,
+            'updated_at': 1
         }
         
-        tailors = list(tailors_collection.find(query, projection).skip(skip).limit(limit).sort('created_at', -1))
-        total_tailors = tailors_collection.count_documents(query)
+        tailors, pagination = paginate(tailors_collection, query, projection, 'total_tailors')
         
-        for tailor in tailors:
-            tailor['_id'] = str(tailor['_id'])
-            tailor['created_at'] = tailor['created_at'].isoformat()
-            tailor['updated_at'] = tailor['updated_at'].isoformat()
-        
-        return jsonify({
+        return conditional_json({
             'tailors': tailors,
-            'pagination': {
-                'current_page': page,
-                'total_pages': (total_tailors + limit - 1) // limit,
-                'total_tailors': total_tailors,
-                'has_next': skip + limit < total_tailors,
-                'has_prev': page > 1
-            }
-        }), 200
+            'pagination': pagination
+        }, etag)
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get tailors', 'error': str(e)}), 500
 
@@ -1167,21 +2828,12 @@ def create_tailor(current_user):
         if existing_tailor is not None:
             return jsonify({'message': 'Tailor with this phone number already exists'}), 409
         
-        new_tailor = {
-            'name': name,
-            'phone': phone,
-            'email': email,
-            'specialization': specialization,
-            'experience': experience,
-            'status': 'active',
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
-        }
+        new_tailor = Tailor(name, phone, email, specialization, experience=experience).to_dict()
         
         result = tailors_collection.insert_one(new_tailor)
-        new_tailor['_id'] = str(result.inserted_id)
-        new_tailor['created_at'] = new_tailor['created_at'].isoformat()
-        new_tailor['updated_at'] = new_tailor['updated_at'].isoformat()
+        invalidate_tailor_directory(result.inserted_id)
+        bump_dashboard_counters(total_tailors=1)
+        bump_list_version('tailors')
         
         return jsonify({
             'message': 'Tailor created successfully',
@@ -1191,6 +2843,54 @@ def create_tailor(current_user):
     except Exception as e:
         return jsonify({'message': 'Failed to create tailor', 'error': str(e)}), 500
 
+@app.route('/api/tailors/<tailor_id>', methods=['PUT', 'OPTIONS'])
+@token_required
+def update_tailor(current_user, tailor_id):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        # For development when DB is not available
+        if tailors_collection is None:
+            return jsonify({'message': 'Tailor updated successfully (demo mode)'}), 200
+            
+        data = request.get_json()
+        
+        tailor = tailors_collection.find_one({'_id': ObjectId(tailor_id)})
+        if tailor is None:
+            return jsonify({'message': 'Tailor not found'}), 404
+        
+        update_data = {
+            'name': data.get('name', tailor.get('name')),
+            'phone': data.get('phone', tailor.get('phone')),
+            'email': data.get('email', tailor.get('email')),
+            'specialization': data.get('specialization', tailor.get('specialization')),
+            'experience': data.get('experience', tailor.get('experience')),
+            'status': data.get('status', tailor.get('status', 'active')),
+            'updated_at': datetime.now()
+        }
+        
+        result = tailors_collection.update_one(
+            {'_id': ObjectId(tailor_id)},
+            {'$set': update_data}
+        )
+        invalidate_tailor_directory(ObjectId(tailor_id))
+        
+        if result.modified_count == 0:
+            return jsonify({'message': 'No changes made'}), 200
+        
+        bump_list_version('tailors')
+        
+        updated_tailor = tailors_collection.find_one({'_id': ObjectId(tailor_id)})
+        
+        return jsonify({
+            'message': 'Tailor updated successfully',
+            'tailor': updated_tailor
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to update tailor', 'error': str(e)}), 500
+
 @app.route('/api/tailors/<tailor_id>/jobs', methods=['GET', 'OPTIONS'])
 @token_required
 def get_tailor_jobs(current_user, tailor_id):
@@ -1236,15 +2936,15 @@ def get_tailor_jobs(current_user, tailor_id):
             }
             
             result = tailors_collection.insert_one(new_tailor)
+            invalidate_tailor_directory(result.inserted_id)
+            bump_dashboard_counters(total_tailors=1)
+            bump_list_version('tailors')
             tailor = tailors_collection.find_one({'_id': result.inserted_id})
         
         if tailor is None:
             return jsonify({'message': 'Tailor not found'}), 404
         
         status = request.args.get('status', '')
-        page = int(request.args.get('page', 1))
-        limit = min(int(request.args.get('limit', 10)), 50)
-        skip = (page - 1) * limit
         
         query = {'tailor_id': tailor['_id']}
         if status:
@@ -1258,20 +2958,11 @@ def get_tailor_jobs(current_user, tailor_id):
             'priority': 1,
             'due_date': 1,
             'created_at': 1,
+            'updated_at': 1,
             'bill_id': 1
         }
         
-        jobs = list(jobs_collection.find(query, projection).skip(skip).limit(limit).sort('created_at', -1))
-        total_jobs = jobs_collection.count_documents(query)
-        
-        for job in jobs:
-            job['_id'] = str(job['_id'])
-            job['tailor_id'] = str(job['tailor_id'])
-            job['bill_id'] = str(job['bill_id']) if job.get('bill_id') else None
-            job['created_at'] = job['created_at'].isoformat()
-            job['updated_at'] = job['updated_at'].isoformat()
-            if job.get('due_date'):
-                job['due_date'] = job['due_date'].isoformat()
+        jobs, pagination = paginate(jobs_collection, query, projection, 'total_jobs')
         
         return jsonify({
             'jobs': jobs,
@@ -1281,15 +2972,11 @@ def get_tailor_jobs(current_user, tailor_id):
                 'phone': tailor['phone'],
                 'specialization': tailor.get('specialization', '')
             },
-            'pagination': {
-                'current_page': page,
-                'total_pages': (total_jobs + limit - 1) // limit,
-                'total_jobs': total_jobs,
-                'has_next': skip + limit < total_jobs,
-                'has_prev': page > 1
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error in get_tailor_jobs: {str(e)}")
         return jsonify({'message': 'Failed to get tailor jobs', 'error': str(e)}), 500
@@ -1315,12 +3002,14 @@ def get_jobs(current_user):
                 }
             }), 200
             
+        # Jobs carry their tailor's details, so tailor writes count too
+        etag, response = list_not_modified('jobs', 'tailors')
+        if response is not None:
+            return response
+        
         search = request.args.get('search', '')
         status = request.args.get('status', '')
         tailor_id = request.args.get('tailor_id', '')
-        page = int(request.args.get('page', 1))
-        limit = min(int(request.args.get('limit', 10)), 50)
-        skip = (page - 1) * limit
         
         query = {}
         if search:
@@ -1344,37 +3033,27 @@ def get_jobs(current_user):
             'priority': 1,
             'due_date': 1,
             'created_at': 1,
+            'updated_at': 1,
             'bill_id': 1
         }
         
-        jobs = list(jobs_collection.find(query, projection).skip(skip).limit(limit).sort('created_at', -1))
-        total_jobs = jobs_collection.count_documents(query)
+        jobs, pagination = paginate(jobs_collection, query, projection, 'total_jobs')
+        
+        # Resolve every tailor on the page from the shared directory
+        tailor_map = resolve_tailors(job.get('tailor_id') for job in jobs)
         
         for job in jobs:
-            job['_id'] = str(job['_id'])
-            job['tailor_id'] = str(job['tailor_id'])
-            job['bill_id'] = str(job['bill_id']) if job.get('bill_id') else None
-            job['created_at'] = job['created_at'].isoformat()
-            job['updated_at'] = job['updated_at'].isoformat()
-            
-            tailor = tailors_collection.find_one({'_id': ObjectId(job['tailor_id'])}, {'name': 1, 'phone': 1})
+            tailor = tailor_map.get(job.get('tailor_id'))
             if tailor is not None:
-                job['tailor'] = {
-                    'name': tailor['name'],
-                    'phone': tailor['phone']
-                }
+                job['tailor'] = tailor
         
-        return jsonify({
+        return conditional_json({
             'jobs': jobs,
-            'pagination': {
-                'current_page': page,
-                'total_pages': (total_jobs + limit - 1) // limit,
-                'total_jobs': total_jobs,
-                'has_next': skip + limit < total_jobs,
-                'has_prev': page > 1
-            }
-        }), 200
+            'pagination': pagination
+        }, etag)
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to get jobs', 'error': str(e)}), 500
 
@@ -1434,11 +3113,8 @@ def create_job(current_user):
         }
         
         result = jobs_collection.insert_one(new_job)
-        new_job['_id'] = str(result.inserted_id)
-        new_job['tailor_id'] = str(new_job['tailor_id'])
-        new_job['bill_id'] = str(new_job['bill_id']) if new_job['bill_id'] else None
-        new_job['created_at'] = new_job['created_at'].isoformat()
-        new_job['updated_at'] = new_job['updated_at'].isoformat()
+        bump_dashboard_counters(total_jobs=1, pending_jobs=1)
+        bump_list_version('jobs')
         
         return jsonify({
             'message': 'Job created successfully',
@@ -1469,42 +3145,265 @@ def update_job_status(current_user, job_id):
         if status not in valid_statuses:
             return jsonify({'message': 'Invalid status'}), 400
         
-        result = jobs_collection.update_one(
+        # Read the previous status atomically to keep the pending counter exact
+        previous = jobs_collection.find_one_and_update(
             {'_id': ObjectId(job_id)},
             {
                 '$set': {
                     'status': status,
                     'updated_at': datetime.now()
                 }
-            }
+            },
+            projection={'status': 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             return jsonify({'message': 'Job not found'}), 404
         
+        bump_dashboard_counters(
+            pending_jobs=(status in PENDING_JOB_STATUSES) - (previous.get('status') in PENDING_JOB_STATUSES)
+        )
+        bump_list_version('jobs')
+        
         return jsonify({'message': 'Job status updated successfully'}), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to update job status', 'error': str(e)}), 500
 
-# Dashboard Statistics Route - Optimized with caching
-@app.route('/api/dashboard/stats', methods=['GET', 'OPTIONS'])
+# Report Routes - answered from the daily rollups, never the raw bills
+@app.route('/api/reports/revenue', methods=['GET', 'OPTIONS'])
 @token_required
-def get_dashboard_stats(current_user):
+def get_revenue_report(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        from_date, to_date = parse_report_range()
+        totals, days = sum_daily_rollups(from_date, to_date)
+        
+        return jsonify({
+            'from_date': from_date,
+            'to_date': to_date,
+            'revenue_data': [
+                {
+                    'date': day['_id'],
+                    'amount': day.get('revenue', 0),
+                    'bills_count': day.get('bill_count', 0),
+                    'discount': day.get('discount', 0),
+                    'advance': day.get('advance', 0),
+                    'outstanding': day.get('outstanding', 0)
+                }
+                for day in days
+            ],
+            'totals': totals
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to get revenue report', 'error': str(e)}), 500
+
+@app.route('/api/bills/stats', methods=['GET', 'OPTIONS'])
+@token_required
+def get_bill_stats(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        from_date, to_date = parse_report_range()
+        totals, _ = sum_daily_rollups(from_date, to_date)
+        
+        return jsonify({
+            'from_date': from_date,
+            'to_date': to_date,
+            'total_bills': totals['bill_count'],
+            'total_revenue': totals['revenue'],
+            'total_discount': totals['discount'],
+            'total_advance': totals['advance'],
+            'total_outstanding': totals['outstanding'],
+            'average_bill_value': totals['revenue'] / totals['bill_count'] if totals['bill_count'] else 0
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to get bill stats', 'error': str(e)}), 500
+
+# CSV export columns per report type: (header, document field)
+EXPORT_COLUMNS = {
+    'bills': [
+        ('Bill No', 'bill_no_str'), ('Created At', 'created_at'), ('Customer', 'customer_name'),
+        ('Phone', 'customer_phone'), ('Status', 'status'), ('Subtotal', 'subtotal'),
+        ('Discount', 'discount'), ('Total', 'total'), ('Advance', 'advance'),
+        ('Balance', 'balance'), ('Due Date', 'due_date')
+    ],
+    'customers': [
+        ('ID', '_id'), ('Name', 'name'), ('Phone', 'phone'), ('Email', 'email'),
+        ('Address', 'address'), ('Created At', 'created_at'), ('Orders', 'order_count'),
+        ('Total Spent', 'total_spent'), ('Outstanding', 'outstanding_balance')
+    ],
+    'jobs': [
+        ('ID', '_id'), ('Title', 'title'), ('Tailor ID', 'tailor_id'), ('Bill ID', 'bill_id'),
+        ('Status', 'status'), ('Priority', 'priority'), ('Due Date', 'due_date'),
+        ('Created At', 'created_at')
+    ]
+}
+EXPORT_BATCH_SIZE = 500
+
+# Spreadsheets run text cells starting with these as formulas; names, notes
+# and phone numbers come from users, so such cells are quoted with a leading '
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def export_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def stream_csv(cursor, columns):
+    # Rows are flushed per cursor batch, so memory stays flat for any export size
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in columns])
+    rows = 0
+    for doc in cursor:
+        writer.writerow([export_cell(doc.get(field)) for _, field in columns])
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def stream_ndjson(cursor, columns):
+    # One JSON object per line, encoded with the app's (fast) JSON provider
+    chunk = []
+    for doc in cursor:
+        chunk.append(app.json.dumps({field: doc.get(field) for _, field in columns}))
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'json': (stream_ndjson, 'application/x-ndjson')
+}
+
+@app.route('/api/reports/export', methods=['GET', 'POST', 'OPTIONS'])
+@token_required
+def export_report(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
+        
+    try:
+        # Accept filters from the query string or a JSON body
+        params = request.args.to_dict()
+        if request.method == 'POST':
+            params.update(request.get_json(silent=True) or {})
+        
+        report_type = params.get('report_type', 'bills')
+        export_format = params.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        if report_type not in EXPORT_COLUMNS:
+            return jsonify({'message': f"report_type must be one of: {', '.join(EXPORT_COLUMNS)}"}), 400
+        
+        collections = {
+            'bills': bills_collection,
+            'customers': customers_collection,
+            'jobs': jobs_collection
+        }
+        collection = collections[report_type]
+        columns = EXPORT_COLUMNS[report_type]
+        
+        if collection is None:
+            cursor = []
+        else:
+            if report_type == 'bills':
+                query = build_bills_query(params)
+            elif report_type == 'customers':
+                query = build_customer_search_query(params.get('search', ''))
+            else:
+                query = {'status': params['status']} if params.get('status') else {}
+            
+            projection = {field: 1 for _, field in columns}
+            cursor = (collection.find(query, projection)
+                      .sort([('created_at', -1), ('_id', -1)])
+                      .batch_size(EXPORT_BATCH_SIZE))
+        
+        stream_rows, mimetype = EXPORT_FORMATS[export_format]
+        extension = 'csv' if export_format == 'csv' else 'ndjson'
+        filename = f"{report_type}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+        return Response(
+            stream_with_context(stream_rows(cursor, columns)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': 'Failed to export report', 'error': str(e)}), 500
+
+@app.route('/api/admin/reports/rebuild-rollups', methods=['POST', 'OPTIONS'])
+@token_required
+def rebuild_daily_rollups_route(current_user):
     if request.method == 'OPTIONS':
         return jsonify(), 200
         
     try:
-        cache_key = "dashboard_stats"
-        cached_stats = cache.get(cache_key)
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Access denied'}), 403
         
-        if cached_stats:
-            return jsonify(cached_stats), 200
+        days = rebuild_daily_rollups()
+        return jsonify({'message': 'Daily rollups rebuilt', 'days': days}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to rebuild daily rollups', 'error': str(e)}), 500
+
+# Dashboard Statistics Route - a point read of the maintained counters
+def load_dashboard_stats():
+    # Cached in dashboard_cache as (payload, etag)
+    today_id = day_bills_counter_id(datetime.now())
+    docs = {
+        doc['_id']: doc
+        for doc in counters_collection.find({'_id': {'$in': [DASHBOARD_COUNTERS_ID, today_id]}})
+    }
+    
+    counters = docs.get(DASHBOARD_COUNTERS_ID)
+    if counters is None:
+        # First request after deployment: seed the counters from a full recount
+        stats = reconcile_dashboard_counters()
+    else:
+        stats = {
+            'total_customers': counters.get('total_customers', 0),
+            'total_bills': counters.get('total_bills', 0),
+            'total_tailors': counters.get('total_tailors', 0),
+            'total_jobs': counters.get('total_jobs', 0),
+            'pending_jobs': counters.get('pending_jobs', 0),
+            'today_bills': docs.get(today_id, {}).get('count', 0),
+            'total_revenue': counters.get('total_revenue', 0)
+        }
+    return stats, make_etag('dashboard_stats', stats)
+
+@app.route('/api/dashboard/stats', methods=['GET', 'OPTIONS'])
+@token_required
+def get_dashboard_stats(current_user):
+    if request.method == 'OPTIONS':
+        return jsonify(), 200
         
+    try:
         # For development when DB is not available
         if (customers_collection is None or bills_collection is None or 
-            tailors_collection is None or jobs_collection is None):
-            stats = {
+            tailors_collection is None or jobs_collection is None or
+            counters_collection is None):
+            return jsonify({
                 'total_customers': 0,
                 'total_bills': 0,
                 'total_tailors': 0,
@@ -1512,55 +3411,9 @@ def get_dashboard_stats(current_user):
                 'pending_jobs': 0,
                 'today_bills': 0,
                 'total_revenue': 0
-            }
-            cache[cache_key] = stats
-            return jsonify(stats), 200
-            
-        # Use parallel execution for better performance
-        def get_count(collection, query=None):
-            try:
-                return collection.count_documents(query if query else {})
-            except:
-                return 0
-        
-        with ThreadPoolExecutor() as executor:
-            # Submit all count operations in parallel
-            future_total_customers = executor.submit(get_count, customers_collection)
-            future_total_bills = executor.submit(get_count, bills_collection)
-            future_total_tailors = executor.submit(get_count, tailors_collection)
-            future_total_jobs = executor.submit(get_count, jobs_collection)
-            future_pending_jobs = executor.submit(get_count, jobs_collection, {'status': {'$in': ['assigned', 'in_progress']}})
-            
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            tomorrow = today + timedelta(days=1)
-            future_today_bills = executor.submit(get_count, bills_collection, {
-                'created_at': {'$gte': today, '$lt': tomorrow}
-            })
-            
-            # Get revenue in separate thread
-            def get_revenue():
-                try:
-                    pipeline = [{'$group': {'_id': None, 'total_revenue': {'$sum': '$total'}}}]
-                    revenue_result = list(bills_collection.aggregate(pipeline))
-                    return revenue_result[0]['total_revenue'] if revenue_result else 0
-                except:
-                    return 0
-            
-            future_total_revenue = executor.submit(get_revenue)
-            
-            # Wait for all results
-            stats = {
-                'total_customers': future_total_customers.result(),
-                'total_bills': future_total_bills.result(),
-                'total_tailors': future_total_tailors.result(),
-                'total_jobs': future_total_jobs.result(),
-                'pending_jobs': future_pending_jobs.result(),
-                'today_bills': future_today_bills.result(),
-                'total_revenue': future_total_revenue.result()
-            }
+            }), 200
         
-        cache[cache_key] = stats
-        return jsonify(stats), 200
+        return conditional_json(*dashboard_cache.get_or_set('stats', load_dashboard_stats))
         
     except Exception as e:
         return jsonify({'message': 'Failed to get dashboard stats', 'error': str(e)}), 500
@@ -1590,6 +3443,38 @@ def after_request(response):
 def before_request():
     request.start_time = time.time()
 
+# Compress text responses above a size threshold; brotli when the client and
+# server both support it, gzip otherwise. Streams and files are left alone.
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html', 'application/x-ndjson'}
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    else:
+        body = gzip.compress(body, compresslevel=6)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 # Initialize default user in background
 def init_default_user_async():
     time.sleep(2)  # Wait for app to start
@@ -1600,6 +3485,23 @@ init_thread = threading.Thread(target=init_default_user_async)
 init_thread.daemon = True
 init_thread.start()
 
+# Build and periodically refresh the customer suggest index in background
+suggest_index_thread = threading.Thread(target=customer_suggest_index_loop)
+suggest_index_thread.daemon = True
+suggest_index_thread.start()
+
+# Periodically recount the dashboard counters to correct any drift
+dashboard_reconcile_thread = threading.Thread(target=dashboard_reconcile_loop)
+dashboard_reconcile_thread.daemon = True
+dashboard_reconcile_thread.start()
+
+# Run index creation in background; started here because it calls the
+# backfill and rebuild helpers defined further down
+if customers_collection is not None:
+    index_thread = threading.Thread(target=create_indexes)
+    index_thread.daemon = True
+    index_thread.start()
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', '5000'))
     # Use production server for better performance
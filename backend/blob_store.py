@@ -0,0 +1,163 @@
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are skipped when Pillow is not installed
+    Image = None
+
+THUMBNAIL_SIZE = (320, 320)
+# The only types blobs are stored and served as. Anything else a client
+# declares (text/html, image/svg+xml, ...) could run script on the API origin,
+# so it is kept as application/octet-stream and served as a download.
+SAFE_IMAGE_TYPES = frozenset({'image/png', 'image/jpeg', 'image/webp', 'image/gif'})
+FALLBACK_CONTENT_TYPE = 'application/octet-stream'
+DATA_URL_PATTERN = re.compile(r'^data:(?P<type>[\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[\w.+-]+)*;base64,(?P<data>.*)$', re.S)
+BLOB_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def blob_id_for(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_data_url(value) -> Optional[Tuple[bytes, str]]:
+    if not isinstance(value, str) or not value.startswith('data:'):
+        return None
+    match = DATA_URL_PATTERN.match(value)
+    if match is None:
+        return None
+    try:
+        data = base64.b64decode(match.group('data'), validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return data, match.group('type') or 'application/octet-stream'
+
+
+def safe_content_type(content_type: Optional[str]) -> str:
+    content_type = (content_type or '').split(';', 1)[0].strip().lower()
+    return content_type if content_type in SAFE_IMAGE_TYPES else FALLBACK_CONTENT_TYPE
+
+
+def make_thumbnail(data: bytes) -> Optional[Tuple[bytes, str]]:
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=80, optimize=True)
+    return output.getvalue(), 'image/jpeg'
+
+
+class FilesystemBlobStore:
+    # Local stand-in for GridFS: blobs live under root/ab/cd/<sha256>
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id[2:4], blob_id)
+
+    @staticmethod
+    def _write(target: str, payload: bytes) -> None:
+        # Write to a temporary file and rename so readers never see partial blobs
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, target)
+
+    def _meta(self, blob_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(blob_id) + '.meta', 'rb') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def exists(self, blob_id: str) -> bool:
+        return os.path.exists(self._path(blob_id))
+
+    def put(self, data: bytes, content_type: str) -> str:
+        blob_id = blob_id_for(data)
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            return blob_id
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {'content_type': safe_content_type(content_type)}
+        self._write(path + '.meta', json.dumps(meta).encode('utf-8'))
+        self._write(path, data)
+        return blob_id
+
+    def read(self, blob_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(blob_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def open(self, blob_id: str) -> Optional[Tuple[BinaryIO, int, str]]:
+        meta = self._meta(blob_id)
+        if meta is None or not self.exists(blob_id):
+            return None
+        path = self._path(blob_id)
+        # Blobs stored before the type list existed may carry any declared type
+        return open(path, 'rb'), os.path.getsize(path), safe_content_type(meta.get('content_type'))
+
+    def thumbnail_of(self, blob_id: str) -> Optional[str]:
+        return (self._meta(blob_id) or {}).get('thumbnail')
+
+    def set_thumbnail(self, blob_id: str, thumbnail_id: str) -> None:
+        meta = self._meta(blob_id)
+        if meta is not None:
+            meta['thumbnail'] = thumbnail_id
+            self._write(self._path(blob_id) + '.meta', json.dumps(meta).encode('utf-8'))
+
+
+class GridFSBlobStore:
+    # Content-addressed GridFS bucket: the file name is the blob's sha256
+    def __init__(self, db, bucket_name: str = 'blobs'):
+        from gridfs import GridFSBucket
+
+        self.bucket = GridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f'{bucket_name}.files']
+
+    def exists(self, blob_id: str) -> bool:
+        return self.files.find_one({'filename': blob_id}, {'_id': 1}) is not None
+
+    def put(self, data: bytes, content_type: str) -> str:
+        blob_id = blob_id_for(data)
+        if not self.exists(blob_id):
+            self.bucket.upload_from_stream(blob_id, data, metadata={'content_type': safe_content_type(content_type)})
+        return blob_id
+
+    def read(self, blob_id: str) -> Optional[bytes]:
+        blob = self.open(blob_id)
+        if blob is None:
+            return None
+        with blob[0] as stream:
+            return stream.read()
+
+    def open(self, blob_id: str) -> Optional[Tuple[BinaryIO, int, str]]:
+        from gridfs.errors import NoFile
+
+        try:
+            stream = self.bucket.open_download_stream_by_name(blob_id)
+        except NoFile:
+            return None
+        content_type = safe_content_type((stream.metadata or {}).get('content_type'))
+        return stream, stream.length, content_type
+
+    def thumbnail_of(self, blob_id: str) -> Optional[str]:
+        doc = self.files.find_one({'filename': blob_id}, {'metadata.thumbnail': 1})
+        return ((doc or {}).get('metadata') or {}).get('thumbnail')
+
+    def set_thumbnail(self, blob_id: str, thumbnail_id: str) -> None:
+        self.files.update_many({'filename': blob_id}, {'$set': {'metadata.thumbnail': thumbnail_id}})
@@ -6,7 +6,9 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/star_tailors'
-    JWT_ACCESS_TOKEN_EXPIRES = 86400  # 24 hours in seconds
+    JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES') or 900)  # 15 minutes in seconds
+    JWT_REFRESH_TOKEN_EXPIRES = int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES') or 604800)  # 7 days in seconds
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS') or 2)
 
 class DevelopmentConfig(Config):
     DEBUG = True
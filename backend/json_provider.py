@@ -0,0 +1,59 @@
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import json_default
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+# JSON_ENCODER=stdlib forces the stdlib encoder even when orjson is installed
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    # Documents are returned as they come from Mongo: ObjectIds and datetimes are
+    # converted while the response is encoded (datetimes as ISO 8601). Keys keep
+    # their document order; sorting them cost more than the conversions did.
+    default = staticmethod(json_default)
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = orjson is not None and JSON_ENCODER != 'stdlib'
+
+    def _dumps_fast(self, obj) -> bytes:
+        # orjson writes datetimes natively in the same ISO 8601 form as
+        # isoformat(); only ObjectId and the rarer types reach json_default
+        return orjson.dumps(obj, default=json_default)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if self.fast and not kwargs:
+            try:
+                return self._dumps_fast(obj).decode('utf-8')
+            except TypeError:
+                # e.g. integers wider than 64 bits; the stdlib encoder copes
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.fast and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # Let the stdlib parser raise its usual error
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip for the common case
+        if not self.fast or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._dumps_fast(obj)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
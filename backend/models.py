@@ -1,8 +1,65 @@
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
 from bson import ObjectId
 from typing import List, Optional
 
+# Money is summed in integer paise so totals never pick up float drift;
+# documents keep storing rupees, converted back once at the end
+def to_paise(amount) -> int:
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_paise(paise: int) -> float:
+    return paise / 100
+
+def line_total_paise(price, quantity) -> int:
+    # Round the line once, after multiplying, so fractional quantities stay exact
+    return to_paise(Decimal(str(price or 0)) * Decimal(str(quantity if quantity is not None else 1)))
+
+def to_number(amount):
+    # The number a client amount (possibly a string like "2" or "199.995")
+    # stands for: an int when it is whole, otherwise a float
+    value = Decimal(str(amount))
+    return int(value) if value == value.to_integral_value() else float(value)
+
+def bill_amounts(line_totals: List[int], discount, advance) -> dict:
+    # Shared by Bill and compute_bill_totals; line totals come in paise
+    subtotal = sum(line_totals)
+    discount = to_paise(discount)
+    advance = to_paise(advance)
+    total = subtotal - discount
+    return {
+        'subtotal': from_paise(subtotal),
+        'discount': from_paise(discount),
+        'total': from_paise(total),
+        'advance': from_paise(advance),
+        'balance': from_paise(total - advance)
+    }
+
+# Encoders for the types Mongo documents carry, looked up by exact type
+# first; subclasses fall through to the isinstance checks below
+JSON_ENCODERS = {
+    ObjectId: str,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal: float,
+}
+
+def json_default(value):
+    # Hook for the JSON encoder: documents go straight to jsonify with their
+    # ObjectIds and datetimes, converted only as they are written out
+    encoder = JSON_ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    for value_type, encoder in JSON_ENCODERS.items():
+        if isinstance(value, value_type):
+            return encoder(value)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
 class User:
+    __slots__ = ('username', 'password', 'role', 'created_at', 'updated_at')
+
     def __init__(self, username: str, password: str, role: str = 'user'):
         self.username = username
         self.password = password
@@ -20,6 +77,8 @@ class User:
         }
 
 class Customer:
+    __slots__ = ('name', 'phone', 'email', 'address', 'notes', 'created_at', 'updated_at')
+
     def __init__(self, name: str, phone: str, 
                  email: Optional[str] = None, 
                  address: Optional[str] = None, 
@@ -44,30 +103,42 @@ class Customer:
         }
 
 class BillItem:
+    __slots__ = ('name', 'description', 'quantity', 'price')
+
     def __init__(self, name: str, price: float, quantity: int = 1, description: Optional[str] = None):
         self.name = name
         self.description = description
         self.quantity = quantity
         self.price = price
     
+    @property
+    def total_paise(self) -> int:
+        return line_total_paise(self.price, self.quantity)
+    
     def to_dict(self):
         return {
             'name': self.name,
             'description': self.description,
             'quantity': self.quantity,
-            'price': self.price
+            'price': self.price,
+            'total': from_paise(self.total_paise)
         }
 
 class Bill:
+    __slots__ = ('customer_id', 'items', 'subtotal', 'discount', 'total', 'advance', 'balance',
+                 'status', 'notes', 'created_at', 'updated_at')
+
     def __init__(self, customer_id: str, items: List[BillItem], 
                  discount: float = 0, advance: float = 0, 
                  status: str = 'pending', notes: Optional[str] = None):
         self.customer_id = ObjectId(customer_id)
         self.items = [item.to_dict() for item in items]
-        self.subtotal = sum(item.price * item.quantity for item in items)
-        self.discount = discount
-        self.advance = advance
-        self.balance = self.subtotal - discount - advance
+        amounts = bill_amounts([item.total_paise for item in items], discount, advance)
+        self.subtotal = amounts['subtotal']
+        self.discount = amounts['discount']
+        self.total = amounts['total']
+        self.advance = amounts['advance']
+        self.balance = amounts['balance']
         self.status = status
         self.notes = notes
         self.created_at = datetime.now()
@@ -79,6 +150,7 @@ class Bill:
             'items': self.items,
             'subtotal': self.subtotal,
             'discount': self.discount,
+            'total': self.total,
             'advance': self.advance,
             'balance': self.balance,
             'status': self.status,
@@ -87,15 +159,45 @@ class Bill:
             'updated_at': self.updated_at
         }
 
+def compute_bill_totals(bills: List[dict]) -> List[dict]:
+    # Bill's arithmetic over raw payload dicts, for many bills at once. The
+    # same rates and quantities recur across thousands of lines, so each
+    # distinct (price, quantity) pair is normalized and converted to paise
+    # only once. Items keep the numeric price and quantity their total was
+    # computed from, not the strings the client may have sent.
+    lines = {}
+    results = []
+    for bill in bills:
+        line_totals = []
+        items = []
+        for item in bill.get('items') or []:
+            key = (str(item.get('price', 0)), str(item.get('quantity', 1)))
+            line = lines.get(key)
+            if line is None:
+                line = lines[key] = (to_number(key[0]), to_number(key[1]), line_total_paise(*key))
+            price, quantity, line_total = line
+            line_totals.append(line_total)
+            items.append({**item, 'price': price, 'quantity': quantity, 'total': from_paise(line_total)})
+        
+        results.append({
+            'items': items,
+            **bill_amounts(line_totals, bill.get('discount', 0), bill.get('advance', 0))
+        })
+    return results
+
 class Tailor:
+    __slots__ = ('name', 'phone', 'email', 'specialization', 'experience', 'status', 'created_at', 'updated_at')
+
     def __init__(self, name: str, phone: str, 
                  email: Optional[str] = None, 
                  specialization: Optional[str] = None, 
-                 status: str = 'active'):
+                 status: str = 'active',
+                 experience=None):
         self.name = name
         self.phone = phone
         self.email = email
         self.specialization = specialization
+        self.experience = experience
         self.status = status
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
@@ -106,12 +208,15 @@ class Tailor:
             'phone': self.phone,
             'email': self.email,
             'specialization': self.specialization,
+            'experience': self.experience,
             'status': self.status,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
 
 class SystemSettings:
+    __slots__ = ('upi_id', 'business_name', 'business_address', 'business_phone', 'created_at', 'updated_at')
+
     def __init__(self, upi_id: str, business_name: str, 
                  business_address: Optional[str] = None, 
                  business_phone: Optional[str] = None):
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
+
+import bcrypt
+from cachetools import TTLCache
+
+
+class HasherBusy(Exception):
+    # The verification queue is full or the pool did not answer in time
+    retry_after = 1
+
+
+class LoginThrottled(Exception):
+    # Too many recent failures for one username
+    def __init__(self, retry_after: int):
+        super().__init__('Too many login attempts')
+        self.retry_after = retry_after
+
+
+def hash_cost(hashed: bytes) -> Optional[int]:
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    try:
+        return int(hashed.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _check(password: bytes, hashed: bytes, rounds: int) -> Tuple[bool, Optional[bytes]]:
+    # Runs in a pool process. Returns (matches, new hash if the cost was off)
+    if not bcrypt.checkpw(password, hashed):
+        return False, None
+    if hash_cost(hashed) != rounds:
+        return True, bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return True, None
+
+
+class PasswordHasher:
+    # bcrypt off the request thread. Work runs on a small process pool, at most
+    # max_pending checks are admitted at once (queued or running) and the rest
+    # are turned away with HasherBusy, so a login rush cannot pin every worker.
+    # Checks for one username run side by side (the default users are shared
+    # role accounts that all log in at shift start); only the failure
+    # bookkeeping around them is locked. After max_failures failed checks
+    # within failure_window seconds the username is throttled; checks already
+    # admitted when the limit is reached may overshoot it by up to max_pending. The failure count lives in this process: with
+    # several gunicorn workers the real limit is max_failures per worker.
+    # Unknown usernames are checked against a dummy hash so response timing
+    # does not reveal which usernames exist. workers=0 runs bcrypt inline.
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 8, timeout: float = 10,
+                 max_failures: int = 5, failure_window: int = 60):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._failures = TTLCache(maxsize=10000, ttl=failure_window)
+        self._dummy_hash = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # A pool created before gunicorn forks belongs to the parent. Pool
+        # processes are not forked from this (multithreaded) worker, where
+        # locks held by other threads at fork time could deadlock the child.
+        # They re-import __main__, which under gunicorn is its launcher script
+        if self._executor is None or self._pid != os.getpid():
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy('Password verification queue is full')
+            self._pending += 1
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+        try:
+            with self._lock:
+                future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # A job that already started cannot be cancelled, so its slot is only
+        # given back once it has actually finished
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HasherBusy('Password verification timed out')
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _dummy(self) -> bytes:
+        with self._lock:
+            if self._dummy_hash is None:
+                self._dummy_hash = bcrypt.hashpw(os.urandom(16), bcrypt.gensalt(self.rounds))
+            return self._dummy_hash
+
+    def verify(self, username: str, password: str, hashed: Optional[bytes]) -> Tuple[bool, Optional[bytes]]:
+        # Returns (matches, rehashed); rehashed is set when the stored hash
+        # used a different cost and should be replaced. hashed=None (no such
+        # user) costs the same as a wrong password and never matches.
+        with self._lock:
+            if self._failures.get(username, 0) >= self.max_failures:
+                raise LoginThrottled(self.failure_window)
+        matches, rehashed = self._run(_check, password.encode('utf-8'),
+                                      hashed if hashed is not None else self._dummy(), self.rounds)
+        matches = matches and hashed is not None
+
+        with self._lock:
+            if matches:
+                self._failures.pop(username, None)
+            else:
+                # Re-setting the key restarts the window from the latest failure
+                self._failures[username] = self._failures.get(username, 0) + 1
+        return matches, (rehashed if matches else None)
+
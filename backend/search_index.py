@@ -0,0 +1,221 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+# Phone numbers are also indexed by digit trigrams so any substring can be found
+NGRAM_LENGTH = 3
+# Rough per-posting and per-entry overheads used for the memory budget
+POSTING_BYTES = 96
+ENTRY_BYTES = 240
+# Upper bound on candidates verified for a substring phone lookup
+MAX_SCAN = 5000
+
+
+def _name_tokens(name: str) -> List[str]:
+    return [token for token in re.split(r'\W+', name.lower()) if token]
+
+
+def _digits(value: str) -> str:
+    return re.sub(r'\D', '', value or '')
+
+
+def _prefix_range(table: List[Tuple[str, str]], prefix: str) -> Tuple[int, int]:
+    # Sorted (key, id) pairs: every key starting with prefix sits in one slice
+    return bisect_left(table, (prefix,)), bisect_left(table, (prefix + '￿',))
+
+
+class CustomerSuggestIndex:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ready = False
+        self.over_budget = False
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        # Sorted (name token, id) and (phone digits, id) pairs for prefix lookups
+        self._tokens: List[Tuple[str, str]] = []
+        self._phones: List[Tuple[str, str]] = []
+        self._ngrams: Dict[str, Set[str]] = {}
+        self._postings = 0
+        # Writes made while a rebuild is running, replayed before the swap
+        self._journal: Optional[list] = None
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    @property
+    def approx_bytes(self) -> int:
+        return self._postings * POSTING_BYTES + len(self._entries) * ENTRY_BYTES
+
+    @staticmethod
+    def _keys(name: str, phone: str):
+        tokens = set(_name_tokens(name))
+        digits = _digits(phone)
+        ngrams = {digits[i:i + NGRAM_LENGTH] for i in range(len(digits) - NGRAM_LENGTH + 1)}
+        return tokens, digits, ngrams
+
+    def add(self, customer_id: str, name: str, phone: str) -> bool:
+        name = name or ''
+        phone = phone or ''
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('add', (customer_id, name, phone)))
+            self._discard(customer_id)
+
+            tokens, digits, ngrams = self._keys(name, phone)
+            postings = len(tokens) + len(ngrams) + (1 if digits else 0)
+            if self.approx_bytes + postings * POSTING_BYTES + ENTRY_BYTES > self.max_bytes:
+                # Refuse to grow past the budget; callers fall back to the database
+                self.over_budget = True
+                return False
+
+            self._entries[customer_id] = (name, phone)
+            for token in tokens:
+                insort(self._tokens, (token, customer_id))
+            if digits:
+                insort(self._phones, (digits, customer_id))
+            for key in ngrams:
+                self._ngrams.setdefault(key, set()).add(customer_id)
+            self._postings += postings
+            return True
+
+    def remove(self, customer_id: str) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('remove', (customer_id,)))
+            self._discard(customer_id)
+
+    def _discard(self, customer_id: str) -> None:
+        entry = self._entries.pop(customer_id, None)
+        if entry is None:
+            return
+
+        tokens, digits, ngrams = self._keys(*entry)
+        for table, keys in ((self._tokens, tokens), (self._phones, {digits} if digits else set())):
+            for key in keys:
+                i = bisect_left(table, (key, customer_id))
+                if i < len(table) and table[i] == (key, customer_id):
+                    del table[i]
+        for key in ngrams:
+            postings = self._ngrams.get(key)
+            if postings is not None:
+                postings.discard(customer_id)
+                if not postings:
+                    del self._ngrams[key]
+        self._postings -= len(tokens) + len(ngrams) + (1 if digits else 0)
+
+    def _search_phone(self, digits: str, limit: int) -> List[str]:
+        # Numbers starting with the typed digits come first
+        start, end = _prefix_range(self._phones, digits)
+        matches = [cid for _, cid in self._phones[start:min(end, start + limit)]]
+        if len(matches) >= limit or len(digits) < NGRAM_LENGTH:
+            return matches
+
+        postings = sorted(
+            (self._ngrams.get(digits[i:i + NGRAM_LENGTH], set())
+             for i in range(len(digits) - NGRAM_LENGTH + 1)),
+            key=len
+        )
+        seen = set(matches)
+        for scanned, cid in enumerate(postings[0]):
+            if scanned >= MAX_SCAN or len(matches) >= limit:
+                break
+            if cid not in seen and all(cid in other for other in postings[1:]) \
+                    and digits in _digits(self._entries[cid][1]):
+                matches.append(cid)
+        return matches
+
+    def _search_name(self, tokens: List[str], limit: int) -> List[str]:
+        # Walk the narrowest token's slice and verify the remaining tokens
+        ranges = sorted(((_prefix_range(self._tokens, token), token) for token in tokens),
+                        key=lambda item: item[0][1] - item[0][0])
+        (start, end), driver = ranges[0]
+        others = [token for _, token in ranges[1:]]
+
+        matches = []
+        seen = set()
+        for i in range(start, end):
+            cid = self._tokens[i][1]
+            if cid in seen:
+                continue
+            seen.add(cid)
+            if others:
+                name_tokens = _name_tokens(self._entries[cid][0])
+                if not all(any(nt.startswith(token) for nt in name_tokens) for token in others):
+                    continue
+            matches.append(cid)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        with self._lock:
+            digits = _digits(query)
+            if digits and re.fullmatch(r'[\d\s+\-()]+', query):
+                matches = self._search_phone(digits, limit)
+            else:
+                tokens = _name_tokens(query)
+                matches = self._search_name(tokens, limit) if tokens else []
+
+            return [
+                {'_id': cid, 'name': self._entries[cid][0], 'phone': self._entries[cid][1]}
+                for cid in matches
+            ]
+
+    def load(self, customers) -> None:
+        # Build into fresh tables and swap them in, so lookups never see a half-built index
+        with self._lock:
+            self._journal = []
+        fresh = CustomerSuggestIndex(self.max_bytes)
+        try:
+            for customer in customers:
+                customer_id = str(customer['_id'])
+                name = customer.get('name') or ''
+                phone = customer.get('phone') or ''
+                tokens, digits, ngrams = self._keys(name, phone)
+                postings = len(tokens) + len(ngrams) + (1 if digits else 0)
+                if fresh.approx_bytes + postings * POSTING_BYTES + ENTRY_BYTES > fresh.max_bytes:
+                    fresh.over_budget = True
+                    break
+
+                # Append unsorted during the bulk build and sort once at the end
+                fresh._entries[customer_id] = (name, phone)
+                fresh._tokens.extend((token, customer_id) for token in tokens)
+                if digits:
+                    fresh._phones.append((digits, customer_id))
+                for key in ngrams:
+                    fresh._ngrams.setdefault(key, set()).add(customer_id)
+                fresh._postings += postings
+            fresh._tokens.sort()
+            fresh._phones.sort()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            for op, args in self._journal:
+                getattr(fresh, op)(*args)
+            self._journal = None
+            self._entries = fresh._entries
+            self._tokens = fresh._tokens
+            self._phones = fresh._phones
+            self._ngrams = fresh._ngrams
+            self._postings = fresh._postings
+            self.over_budget = fresh.over_budget
+            self.ready = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'entries': len(self._entries),
+                'approx_bytes': self.approx_bytes,
+                'max_bytes': self.max_bytes,
+                'over_budget': self.over_budget
+            }
@@ -0,0 +1,74 @@
+import os
+import threading
+
+from pymongo import ReturnDocument
+
+
+class SequenceAllocator:
+    # Hands out numbers from a counters document. In leased mode each process
+    # reserves block_size numbers with one $inc and serves them from memory, so
+    # numbers are unique but only increasing within a process, and a lease left
+    # unused when the process exits becomes a gap. Gapless mode takes every
+    # number straight from the counter, so numbers follow commit order across
+    # processes. It is best-effort, not strict: a failed insert is only given
+    # back if nothing was taken after it, and a partly failed bulk insert keeps
+    # its gaps.
+    def __init__(self, collection, name: str, block_size: int = 20, gapless: bool = False):
+        self.collection = collection
+        self.name = name
+        self.block_size = max(1, block_size)
+        self.gapless = gapless
+        self._next = 0
+        self._end = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _reserve(self, count: int) -> int:
+        doc = self.collection.find_one_and_update(
+            {'_id': self.name},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return int(doc['seq']) - count + 1
+
+    def take(self, count: int = 1) -> int:
+        # Returns the first of `count` consecutive numbers
+        if self.gapless:
+            return self._reserve(count)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not reuse its parent's lease
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._end - self._next >= count:
+                first = self._next
+                self._next += count
+                return first
+            if count >= self.block_size:
+                # Large requests get their own block and leave the lease alone
+                return self._reserve(count)
+            first = self._reserve(self.block_size)
+            self._next, self._end = first + count, first + self.block_size
+            return first
+
+    def release(self, first: int, count: int = 1) -> bool:
+        # Gapless mode only: roll the counter back if nothing was taken since.
+        # Returns False (the numbers stay a gap) otherwise
+        if not self.gapless:
+            return False
+        result = self.collection.update_one(
+            {'_id': self.name, 'seq': first + count - 1},
+            {'$inc': {'seq': -count}}
+        )
+        return result.modified_count == 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'mode': 'gapless' if self.gapless else 'leased',
+                'block_size': self.block_size,
+                'leased_remaining': self._end - self._next
+            }
@@ -0,0 +1,354 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from bson import json_util
+from cachetools import TTLCache
+
+# Invalidation records older than this are pruned from the shared log
+INVALIDATION_RETENTION_SECONDS = 3600
+
+
+class SQLiteCacheBackend:
+    # Shared L2 for every worker on the host: one SQLite file in WAL mode.
+    # Alongside the entries it keeps an append-only invalidation log that
+    # workers poll to drop keys from their in-process L1. Values are stored as
+    # extended JSON (bson.json_util), so dicts, ObjectIds and datetimes round
+    # trip and nothing read back from the file is ever executed.
+    def __init__(self, path: str, timeout: float = 2.0):
+        self.path = path
+        self.timeout = timeout
+        self._pid = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are not shared across fork(): each worker opens its own
+        if self._conn is None or self._pid != os.getpid():
+            # Only the app user may read or plant cache files
+            os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS invalidations '
+                         '(seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS invalidations_key ON invalidations (key, seq)')
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _epoch(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute('SELECT MAX(seq) FROM invalidations WHERE key = ?', (key,)).fetchone()
+        return row[0] or 0
+
+    def epoch(self, key: str) -> int:
+        # The key's latest invalidation; read it before computing a value and
+        # pass it to set()
+        with self._lock:
+            return self._epoch(self._connection(), key)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json_util.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, ttl: float, epoch: Optional[int] = None) -> bool:
+        # With an epoch, the write is refused (False) when the key was
+        # invalidated since, so a slow reader cannot put back an old value
+        data = json_util.dumps(value)
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if epoch is not None and self._epoch(conn, key) > epoch:
+                    conn.execute('ROLLBACK')
+                    return False
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, data, time.time() + ttl)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return True
+
+    def delete(self, key: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                conn.execute('INSERT INTO invalidations (key, at) VALUES (?, ?)', (key, now))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def latest_invalidation(self) -> int:
+        with self._lock:
+            row = self._connection().execute('SELECT MAX(seq) FROM invalidations').fetchone()
+        return row[0] or 0
+
+    def invalidations_since(self, seq: int) -> Tuple[int, List[str]]:
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT seq, key FROM invalidations WHERE seq > ? ORDER BY seq', (seq,)
+            ).fetchall()
+        if not rows:
+            return seq, []
+        return rows[-1][0], [key for _, key in rows]
+
+    def purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            conn.execute('DELETE FROM invalidations WHERE at < ?', (now - INVALIDATION_RETENTION_SECONDS,))
+
+
+class _CountingTTLCache(TTLCache):
+    # Counts entries pushed out by maxsize (expired entries are not evictions)
+    def __init__(self, maxsize, ttl, on_evict):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict(item[0])
+        return item
+
+
+class _Flight:
+    # One in-progress recomputation that concurrent callers wait on.
+    # invalidated is set when the key is popped while it runs
+    __slots__ = ('event', 'value', 'error', 'invalidated')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.invalidated = False
+
+
+class TwoTierCache:
+    # One cache namespace: an in-process L1 in front of an optional shared L2.
+    # Reads fall through L1 -> L2 -> caller; pop() deletes from both tiers and
+    # is broadcast to the other workers, which apply it at most sync_interval
+    # seconds later. Keys are stored in the L2 as "<name>:<key>" so namespaces
+    # with different sizes and TTLs share one backend.
+    #
+    # get_or_set() recomputes a missing key once per process however many
+    # requests ask for it, and with stale_ttl > 0 keeps serving an expired
+    # value for that long while one background refresh runs.
+    # Without a backend it behaves like a plain per-process TTLCache.
+    def __init__(self, backend=None, name: str = 'default', maxsize: int = 100, ttl: float = 300,
+                 stale_ttl: float = 0, sync_interval: float = 1.0, max_tracked_keys: int = 1000):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sync_interval = sync_interval
+        self.max_tracked_keys = max_tracked_keys
+        self._prefix = name + ':'
+        # L1 entries are (value, fresh_until, expires_at) in wall-clock time
+        self._l1 = _CountingTTLCache(maxsize, ttl + stale_ttl, self._evicted)
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._metrics = {}
+        self._totals = dict.fromkeys(
+            ('l1_hits', 'l2_hits', 'stale_hits', 'misses', 'sets', 'invalidations',
+             'evictions', 'coalesced', 'refreshes', 'refresh_errors', 'l2_errors'), 0
+        )
+        self._last_sync = time.monotonic()
+        self._last_purge = time.monotonic()
+        self._seq = self._l2_call(backend.latest_invalidation, default=0) if backend else 0
+
+    def _count(self, key: str, event: str) -> None:
+        # Per-key counters; keys beyond the tracking limit are pooled under '*'
+        with self._lock:
+            self._totals[event] += 1
+            if key not in self._metrics and len(self._metrics) >= self.max_tracked_keys:
+                key = '*'
+            counters = self._metrics.setdefault(
+                key, {'l1_hits': 0, 'l2_hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0}
+            )
+            counters[event] += 1
+
+    def _evicted(self, key) -> None:
+        # Called from inside the L1 while self._lock is held
+        self._totals['evictions'] += 1
+
+    def _l2_call(self, fn, *args, default=None):
+        # A broken or locked L2 degrades to L1-only caching instead of failing requests
+        try:
+            return fn(*args)
+        except (sqlite3.Error, OSError, TypeError, ValueError):
+            with self._lock:
+                self._totals['l2_errors'] += 1
+            return default
+
+    def _sync(self) -> None:
+        now = time.monotonic()
+        if self.backend is None or now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        seq, keys = self._l2_call(self.backend.invalidations_since, self._seq, default=(self._seq, []))
+        with self._lock:
+            self._seq = max(self._seq, seq)
+            for key in keys:
+                if key.startswith(self._prefix):
+                    self._l1.pop(key[len(self._prefix):], None)
+        if now - self._last_purge > self.ttl + self.stale_ttl:
+            self._last_purge = now
+            self._l2_call(self.backend.purge)
+
+    def _lookup(self, key: str):
+        # Returns ((value, fresh_until, expires_at), tier) or (None, None)
+        self._sync()
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+        if entry is not None and entry[2] > now:
+            return entry, 'l1_hits'
+
+        if self.backend is not None:
+            found = self._l2_call(self.backend.get, self._prefix + key)
+            if found is not None:
+                value, expires_at = found
+                entry = (value, expires_at - self.stale_ttl, expires_at)
+                with self._lock:
+                    self._l1[key] = entry
+                return entry, 'l2_hits'
+        return None, None
+
+    def get(self, key: str, default=None):
+        # Plain reads only return fresh values
+        entry, tier = self._lookup(key)
+        if entry is not None and entry[1] > time.time():
+            self._count(key, tier)
+            return entry[0]
+        self._count(key, 'misses')
+        return default
+
+    def set(self, key: str, value, ttl: Optional[float] = None, epoch: Optional[int] = None) -> None:
+        # epoch comes from backend.epoch() before the value was computed; the
+        # value is dropped if another worker invalidated the key since
+        ttl = ttl or self.ttl
+        if self.backend is not None:
+            stored = self._l2_call(self.backend.set, self._prefix + key, value, ttl + self.stale_ttl, epoch)
+            if stored is False:
+                return
+        fresh_until = time.time() + ttl
+        with self._lock:
+            self._l1[key] = (value, fresh_until, fresh_until + self.stale_ttl)
+        self._count(key, 'sets')
+
+    def __setitem__(self, key: str, value) -> None:
+        self.set(key, value)
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            entry = self._l1.pop(key, None)
+            # A computation of this key started before now must not store its result
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.invalidated = True
+        if self.backend is not None:
+            self._l2_call(self.backend.delete, self._prefix + key)
+        self._count(key, 'invalidations')
+        return entry[0] if entry is not None else default
+
+    def get_or_set(self, key: str, compute: Callable[[], Any]):
+        # Returns the cached value, or compute()'s result (cached unless it is None)
+        entry, tier = self._lookup(key)
+        if entry is not None:
+            if entry[1] <= time.time():
+                tier = 'stale_hits'
+                self._refresh_in_background(key, compute)
+            self._count(key, tier)
+            return entry[0]
+        self._count(key, 'misses')
+        return self._compute(key, compute)
+
+    def _start_flight(self, key: str):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _run_flight(self, key: str, compute, flight: _Flight) -> None:
+        try:
+            l2_epoch = None
+            if self.backend is not None:
+                l2_epoch = self._l2_call(self.backend.epoch, self._prefix + key)
+            flight.value = compute()
+            with self._lock:
+                current = not flight.invalidated
+            if current and flight.value is not None:
+                self.set(key, flight.value, epoch=l2_epoch)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _compute(self, key: str, compute):
+        flight, leader = self._start_flight(key)
+        if leader:
+            self._run_flight(key, compute, flight)
+        else:
+            with self._lock:
+                self._totals['coalesced'] += 1
+            flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _refresh_in_background(self, key: str, compute) -> None:
+        flight, leader = self._start_flight(key)
+        if not leader:
+            return
+        with self._lock:
+            self._totals['refreshes'] += 1
+
+        def refresh():
+            self._run_flight(key, compute, flight)
+            if flight.error is not None:
+                # The stale value keeps being served until it expires
+                with self._lock:
+                    self._totals['refresh_errors'] += 1
+
+        threading.Thread(target=refresh, name=f'cache-refresh-{self.name}', daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            totals = dict(self._totals)
+            hits = totals['l1_hits'] + totals['l2_hits'] + totals['stale_hits']
+            lookups = hits + totals['misses']
+            return {
+                'name': self.name,
+                'backend': type(self.backend).__name__ if self.backend else None,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'l1_entries': len(self._l1),
+                'l1_maxsize': self._l1.maxsize,
+                'invalidation_seq': self._seq,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                **totals,
+                'keys': {key: dict(counters) for key, counters in self._metrics.items()}
+            }
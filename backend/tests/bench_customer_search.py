@@ -0,0 +1,133 @@
+# Customer search on a synthetic 100k-customer collection: the original
+# unanchored case-insensitive $regex over name/phone/email against
+# build_customer_search_query (indexed prefix fields and the text index).
+#
+# Needs a real MongoDB, since index use is the point; the data goes into a
+# throwaway database that is dropped afterwards (unless --keep).
+#
+#     BENCH_MONGO_URI=mongodb://localhost:27017 python backend/tests/bench_customer_search.py \
+#         [--customers 100000] [--runs 20]
+#
+# For every query it prints the median latency of fetching one 20-row page
+# and, from explain(), the winning plan's stage and documents examined.
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100')
+os.environ.setdefault('CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient  # noqa: E402
+
+import app as backend  # noqa: E402
+
+FIRST_NAMES = ['ravi', 'anita', 'suresh', 'priya', 'mohan', 'kavya', 'arjun', 'meera', 'vikram', 'lakshmi',
+               'rahul', 'divya', 'karthik', 'sneha', 'ganesh', 'pooja', 'naveen', 'deepa', 'ajay', 'swathi']
+LAST_NAMES = ['kumar', 'sharma', 'reddy', 'iyer', 'nair', 'patel', 'rao', 'gupta', 'menon', 'singh',
+              'das', 'pillai', 'verma', 'shetty', 'joshi', 'bhat', 'naidu', 'kapoor', 'mehta', 'chopra']
+DOMAINS = ['gmail.com', 'yahoo.co.in', 'outlook.com', 'startailors.in']
+
+QUERIES = [
+    ('one word, first name', 'ravi'),
+    ('one word, surname', 'kuma'),
+    ('phone prefix', '98765'),
+    ('email', 'meera.iyer1@'),
+    ('two words', 'priya sharma'),
+]
+
+# The same customer indexes create_indexes builds
+INDEXES = [
+    [('phone', 1)],
+    [('name', 'text'), ('phone', 'text'), ('email', 'text')],
+    [('created_at', -1), ('_id', -1)],
+    [('name_lower', 1)],
+    [('name_words', 1)],
+    [('email_lower', 1)],
+    [('phone_digits', 1)],
+]
+
+
+def legacy_query(search: str) -> dict:
+    # get_customers before the search fields existed
+    return {'$or': [
+        {'name': {'$regex': search, '$options': 'i'}},
+        {'phone': {'$regex': search, '$options': 'i'}},
+        {'email': {'$regex': search, '$options': 'i'}}
+    ]}
+
+
+def synthetic_customers(count: int):
+    rng = random.Random(42)
+    for n in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name = f'{first.title()} {last.title()}'
+        phone = f'9{rng.randrange(10 ** 9):09d}'
+        email = f'{first}.{last}{n % 97}@{rng.choice(DOMAINS)}'
+        yield {'name': name, 'phone': phone, 'email': email,
+               **backend.customer_search_fields(name, phone, email)}
+
+
+def plan_summary(collection, query) -> str:
+    explain = collection.find(query).limit(20).explain()
+    stats = explain.get('executionStats', {})
+    stages = []
+    stage = explain.get('queryPlanner', {}).get('winningPlan', {})
+    while stage:
+        stages.append(stage.get('stage', '?'))
+        stage = stage.get('inputStage') or (stage.get('inputStages') or [None])[0]
+    return f"{'>'.join(stages):28} examined {stats.get('totalDocsExamined', '?'):>7}"
+
+
+def median_ms(collection, query, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        list(collection.find(query, {'name': 1, 'phone': 1}).limit(20))
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark customer search')
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark database')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017'),
+                         serverSelectionTimeoutMS=5000)
+    db = client[f'bench_customer_search_{os.getpid()}']
+    collection = db.customers
+    try:
+        started = time.perf_counter()
+        batch = []
+        for doc in synthetic_customers(args.customers):
+            batch.append(doc)
+            if len(batch) == 5000:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+        for keys in INDEXES:
+            collection.create_index(keys)
+        print(f'loaded {args.customers:,} customers in {time.perf_counter() - started:.1f}s\n')
+
+        print(f"{'query':22} {'mode':8} {'median':>9}  plan")
+        for label, search in QUERIES:
+            for mode, query in (('legacy', legacy_query(re.escape(search))),
+                                ('indexed', backend.build_customer_search_query(search))):
+                print(f'{label:22} {mode:8} {median_ms(collection, query, args.runs):>7.2f}ms  '
+                      f'{plan_summary(collection, query)}')
+    finally:
+        if not args.keep:
+            client.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    main()
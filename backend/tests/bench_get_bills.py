@@ -0,0 +1,158 @@
+# Latency of one 50-row GET /api/bills page: the customer join as it was
+# (one find_one per distinct customer on the page) against the single $in
+# fetch in fetch_customers_by_ids.
+#
+# The real route runs through the Flask test client on top of in-memory
+# collections that sleep for a simulated round trip on every query, so the
+# difference is the number of round trips the page needs.
+#
+#     python backend/tests/bench_get_bills.py [--latency-ms 5] [--customers 50] [--runs 20]
+#
+# Runs without MongoDB (the app falls back to demo mode).
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100')
+os.environ.setdefault('CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+
+import app as backend  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, collection, docs):
+        self.collection = collection
+        self.docs = docs
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, keys, direction=None):
+        keys = [(keys, direction or 1)] if isinstance(keys, str) else keys
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda doc: doc.get(field), reverse=order < 0)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        # The query goes out when the cursor is first read
+        self.collection.round_trip()
+        end = self._skip + self._limit if self._limit else None
+        return iter([dict(doc) for doc in self.docs[self._skip:end]])
+
+
+class FakeCollection:
+    # Just the reads get_bills makes, each paying one simulated round trip
+    def __init__(self, name, docs, latency):
+        self.name = name
+        self.docs = docs
+        self.latency = latency
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    def _matches(self, doc, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict) and '$in' in condition:
+                if doc.get(field) not in condition['$in']:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, [doc for doc in self.docs if self._matches(doc, query or {})])
+
+    def find_one(self, query=None, projection=None):
+        self.round_trip()
+        return next((dict(doc) for doc in self.docs if self._matches(doc, query or {})), None)
+
+    def count_documents(self, query):
+        self.round_trip()
+        return sum(1 for doc in self.docs if self._matches(doc, query))
+
+    def estimated_document_count(self):
+        self.round_trip()
+        return len(self.docs)
+
+
+def legacy_fetch_customers_by_ids(customer_ids) -> dict:
+    # get_bills before the batched join: one find_one per distinct customer
+    customer_map = {}
+    for customer_id in customer_ids:
+        if customer_id in customer_map:
+            continue
+        customer = backend.customers_collection.find_one({'_id': customer_id}, {'name': 1, 'phone': 1})
+        if customer is not None:
+            customer_map[customer_id] = {'_id': customer['_id'], 'name': customer.get('name', 'Unknown'),
+                                         'phone': customer.get('phone', 'N/A')}
+    return customer_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the GET /api/bills customer join')
+    parser.add_argument('--latency-ms', type=float, default=5, help='simulated round trip per query')
+    parser.add_argument('--customers', type=int, default=50, help='distinct customers on the page')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    customers = [{'_id': ObjectId(), 'name': f'Customer {n}', 'phone': f'9{n:09d}'}
+                 for n in range(args.customers)]
+    started = datetime(2026, 1, 1)
+    bills = [{
+        '_id': ObjectId(),
+        'customer_id': customers[n % len(customers)]['_id'],
+        'customer_name': customers[n % len(customers)]['name'],
+        'customer_phone': customers[n % len(customers)]['phone'],
+        'total': 1000, 'balance': 0, 'status': 'pending',
+        'created_at': started + timedelta(minutes=n), 'bill_no_str': f'{n:03d}'
+    } for n in range(500)]
+    backend.bills_collection = FakeCollection('bills', bills, latency)
+    backend.customers_collection = FakeCollection('customers', customers, latency)
+
+    client = backend.app.test_client()
+    headers = {'Authorization': 'Bearer ' + backend.issue_tokens(
+        {'_id': ObjectId(), 'username': 'admin', 'role': 'admin'})['token']}
+    batched = backend.fetch_customers_by_ids
+
+    print(f'50-row page, {args.customers} distinct customers, {args.latency_ms:g} ms per round trip\n')
+    results = {}
+    for name, join in (('legacy (find_one per customer)', legacy_fetch_customers_by_ids),
+                       ('batched ($in)', batched)):
+        backend.fetch_customers_by_ids = join
+        timings = []
+        for _ in range(args.runs):
+            backend.customers_collection.round_trips = 0
+            backend.bills_collection.round_trips = 0
+            began = time.perf_counter()
+            response = client.get('/api/bills?limit=50', headers=headers)
+            timings.append((time.perf_counter() - began) * 1000)
+            assert response.status_code == 200 and len(response.get_json()['bills']) == 50, response.status_code
+        round_trips = backend.customers_collection.round_trips + backend.bills_collection.round_trips
+        results[name] = statistics.median(timings)
+        print(f'{name:32} median {results[name]:>8.1f} ms   p95 {sorted(timings)[int(len(timings) * .95) - 1]:>8.1f} ms'
+              f'   {round_trips} round trips')
+    backend.fetch_customers_by_ids = batched
+
+    legacy, batched_ms = results.values()
+    print(f'\nspeed-up: {legacy / batched_ms:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
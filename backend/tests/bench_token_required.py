@@ -0,0 +1,108 @@
+# Throughput of token_required against the decorator it replaced.
+#
+# The old decorator ran jwt.decode and a users lookup on every request; the
+# current one serves repeat tokens from VerifiedTokenCache. Both wrap the same
+# trivial view and are called from several threads inside a request context,
+# so the numbers are the per-request cost of authentication alone.
+#
+#     python backend/tests/bench_token_required.py [--requests 20000] [--threads 8]
+#
+# Runs without MongoDB (the app falls back to demo mode).
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import wraps
+
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100')
+os.environ.setdefault('CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from cachetools import TTLCache  # noqa: E402
+from flask import jsonify, request  # noqa: E402
+
+import app as backend  # noqa: E402
+
+USER = {'_id': ObjectId(), 'username': 'admin', 'role': 'admin'}
+# Stands in for the users cache the old decorator read after every decode
+legacy_users = TTLCache(maxsize=1000, ttl=300)
+legacy_users[str(USER['_id'])] = USER
+
+
+def legacy_token_required(f):
+    # token_required as it was before the verified-token cache
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'message': 'Token is missing'}), 401
+        try:
+            if token.startswith('Bearer '):
+                token = token[7:]
+            data = jwt.decode(token, backend.app.config['SECRET_KEY'], algorithms=['HS256'])
+            current_user = legacy_users.get(data['user_id'])
+            if current_user is None:
+                return jsonify({'message': 'User not found'}), 401
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Token is invalid'}), 401
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+
+def view(current_user):
+    return current_user['username']
+
+
+def run(decorated, headers, requests: int, threads: int) -> float:
+    # Returns requests per second over all threads
+    def worker(count):
+        with backend.app.test_request_context('/api/bench', headers=headers):
+            for _ in range(count):
+                result = decorated()
+                assert result == 'admin', result
+
+    per_thread = requests // threads
+    run_thread = lambda _: worker(per_thread)  # noqa: E731
+    # Warm-up fills the token cache, as any earlier request would
+    worker(1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(run_thread, range(threads)))
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark token_required')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    tokens = backend.issue_tokens(USER)
+    headers = {'Authorization': 'Bearer ' + tokens['token']}
+    # The old decorator's tokens had no type claim
+    legacy_token = jwt.encode({
+        'user_id': str(USER['_id']),
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, backend.app.config['SECRET_KEY'], algorithm='HS256')
+    legacy_headers = {'Authorization': 'Bearer ' + legacy_token}
+
+    results = [
+        ('legacy (decode + users lookup)', run(legacy_token_required(view), legacy_headers,
+                                                args.requests, args.threads)),
+        ('token_required (verified-token cache)', run(backend.token_required(view), headers,
+                                                      args.requests, args.threads)),
+    ]
+    for name, rps in results:
+        print(f'{name:40} {rps:>10,.0f} req/s  {1e6 / rps:>7.1f} us/req')
+    print(f'speed-up: {results[1][1] / results[0][1]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+
+from sequence_allocator import SequenceAllocator
+
+
+class FakeCounters:
+    # Just enough of a counters collection for SequenceAllocator. Writes to one
+    # document are serialized as on the server, with some round-trip latency
+    # so that threads really interleave.
+    def __init__(self, latency: float = 0.0005):
+        self.latency = latency
+        self.docs = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=ReturnDocument.BEFORE):
+        time.sleep(self.latency)
+        with self._lock:
+            self.writes += 1
+            doc = self.docs.setdefault(query['_id'], {'_id': query['_id'], 'seq': 0})
+            doc['seq'] += update['$inc']['seq']
+            return dict(doc)
+
+    def update_one(self, query, update):
+        time.sleep(self.latency)
+        with self._lock:
+            self.writes += 1
+            doc = self.docs.get(query['_id'])
+            if doc is None or doc['seq'] != query['seq']:
+                return SimpleNamespace(modified_count=0)
+            doc['seq'] += update['$inc']['seq']
+            return SimpleNamespace(modified_count=1)
+
+
+def take_concurrently(allocators, threads=16, per_thread=50, count=1):
+    def worker(i):
+        allocator = allocators[i % len(allocators)]
+        return [allocator.take(count) for _ in range(per_thread)]
+
+    with ThreadPoolExecutor(threads) as executor:
+        return [first for firsts in executor.map(worker, range(threads)) for first in firsts]
+
+
+def test_leased_numbers_are_unique_across_processes():
+    counters = FakeCounters()
+    # One allocator per simulated worker process, all on the same counter
+    allocators = [SequenceAllocator(counters, 'bill_no', block_size=20) for _ in range(4)]
+
+    numbers = take_concurrently(allocators)
+
+    assert len(set(numbers)) == len(numbers) == 800
+    # One counter write per lease instead of one per number
+    assert counters.writes <= 800 // 20 + len(allocators)
+
+
+def test_leased_blocks_do_not_overlap():
+    counters = FakeCounters()
+    allocators = [SequenceAllocator(counters, 'bill_no', block_size=20) for _ in range(4)]
+
+    firsts = take_concurrently(allocators, threads=8, per_thread=20, count=3)
+    numbers = [first + offset for first in firsts for offset in range(3)]
+
+    assert len(set(numbers)) == len(numbers)
+
+
+def test_gapless_numbers_are_consecutive():
+    counters = FakeCounters()
+    allocators = [SequenceAllocator(counters, 'bill_no', gapless=True) for _ in range(4)]
+
+    numbers = take_concurrently(allocators)
+
+    assert sorted(numbers) == list(range(1, 801))
+
+
+def test_gapless_release_only_rolls_back_the_latest_block():
+    counters = FakeCounters(latency=0)
+    allocator = SequenceAllocator(counters, 'bill_no', gapless=True)
+
+    first = allocator.take(5)
+    assert allocator.release(first, 5)
+    assert allocator.take(1) == first
+
+    # Something was taken after this block, so releasing it leaves a gap
+    block = allocator.take(3)
+    allocator.take(1)
+    assert not allocator.release(block, 3)
+    assert counters.docs['bill_no']['seq'] == block + 3
+
+
+def test_leased_release_is_a_no_op():
+    counters = FakeCounters(latency=0)
+    allocator = SequenceAllocator(counters, 'bill_no', block_size=10)
+
+    first = allocator.take(1)
+    assert not allocator.release(first, 1)
+    assert allocator.take(1) == first + 1
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+import time
+from typing import Optional, Tuple
+
+from cachetools import LRUCache
+
+
+class VerifiedTokenCache:
+    # Per-process LRU of tokens whose signature has already been checked:
+    # sha256(token) -> (user_id, (claims, current_user), valid_until). A hit
+    # skips jwt.decode; the claims come back so the caller can still check
+    # revocation on every request. Entries are dropped at the token's exp
+    # claim, or after max_age so changes to the user record still show up.
+    # Only the digest is kept, never the token itself.
+    def __init__(self, maxsize: int = 4096, max_age: float = 300):
+        self.max_age = max_age
+        self._entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[Tuple[dict, dict]]:
+        # Returns (claims, current_user) or None
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > time.time():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, token: str, claims: dict, current_user: dict) -> None:
+        now = time.time()
+        valid_until = min(float(claims.get('exp', now + self.max_age)), now + self.max_age)
+        with self._lock:
+            self._entries[self.digest(token)] = (str(claims.get('user_id')), (claims, current_user), valid_until)
+
+    def forget_user(self, user_id) -> int:
+        # Drops every cached token of one user; returns how many were dropped
+        user_id = str(user_id)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[0] == user_id]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def forget(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self._entries.maxsize,
+                'max_age': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+# Each sync re-reads this many seconds of revocations, so a document that
+# became visible late (clock skew, replication) is not skipped
+SYNC_OVERLAP_SECONDS = 5
+
+
+def _epoch(value: datetime) -> float:
+    # Mongo hands back naive datetimes that are in UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationSet:
+    # In-memory mirror of the token_revocations collection. Two kinds of entry:
+    #   user:<id>  every token of that user issued at or before revoked_at
+    #   jti:<jti>  one token (used refresh tokens, logouts)
+    # Entries carry expires_at (a TTL index removes them from Mongo) after
+    # which every token they cover has expired anyway, so the set stays small.
+    # Revocations made by this process apply at once; other workers pick them
+    # up within sync_interval seconds. Without a collection it is process-local.
+    def __init__(self, collection=None, sync_interval: float = 2.0,
+                 on_user_revoked: Optional[Callable[[str], None]] = None):
+        self.collection = collection
+        self.sync_interval = sync_interval
+        self.on_user_revoked = on_user_revoked
+        self._users = {}   # user id -> (revoked_at, expires_at) in epoch seconds
+        self._jtis = {}    # jti -> expires_at
+        self._lock = threading.Lock()
+        self._last_sync = None
+        self._high_water = None
+
+    def _apply(self, doc) -> None:
+        expires_at = _epoch(doc['expires_at'])
+        if doc['kind'] == 'user':
+            revoked_at = _epoch(doc['revoked_at'])
+            with self._lock:
+                previous = self._users.get(doc['user_id'])
+                self._users[doc['user_id']] = (revoked_at, expires_at)
+            if previous is None or previous[0] < revoked_at:
+                if self.on_user_revoked is not None:
+                    self.on_user_revoked(doc['user_id'])
+        else:
+            with self._lock:
+                self._jtis[doc['jti']] = expires_at
+
+    def _prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            self._users = {uid: entry for uid, entry in self._users.items() if entry[1] > now}
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+
+    def sync(self, force: bool = False) -> None:
+        # Rate limited: one indexed query per sync_interval, not per request
+        now = time.monotonic()
+        if self.collection is None or (not force and self._last_sync is not None
+                                       and now - self._last_sync < self.sync_interval):
+            return
+        self._last_sync = now
+        query = {'expires_at': {'$gt': datetime.utcnow()}}
+        if self._high_water is not None:
+            query['created_at'] = {'$gte': self._high_water - timedelta(seconds=SYNC_OVERLAP_SECONDS)}
+        try:
+            for doc in self.collection.find(query):
+                self._apply(doc)
+                if self._high_water is None or doc['created_at'] > self._high_water:
+                    self._high_water = doc['created_at']
+        except PyMongoError as e:
+            # Keep serving from the last known set; the next sync retries
+            print(f"⚠️  Token revocation sync failed: {str(e)}")
+            return
+        if self._high_water is None:
+            self._high_water = datetime.utcnow()
+        self._prune()
+
+    def is_revoked(self, claims: dict) -> bool:
+        with self._lock:
+            if claims.get('jti') in self._jtis:
+                return True
+            entry = self._users.get(str(claims.get('user_id')))
+        if entry is None:
+            return False
+        # iat_ms (milliseconds) decides when present. Plain iat is whole seconds,
+        # so it only covers tokens from before the second of the revocation and
+        # a login right after a revocation stays valid. Tokens without either
+        # predate revocation support and count as issued at 0
+        if 'iat_ms' in claims:
+            return claims['iat_ms'] <= entry[0] * 1000
+        return claims.get('iat', 0) < math.floor(entry[0])
+
+    def is_token_revoked(self, jti) -> bool:
+        with self._lock:
+            return jti in self._jtis
+
+    def revoke_user(self, user_id, lifetime: float) -> None:
+        # Revokes every token of the user issued up to now; lifetime is the
+        # longest any of them can still live
+        now = datetime.utcnow()
+        doc = {
+            '_id': f'user:{user_id}',
+            'kind': 'user',
+            'user_id': str(user_id),
+            'revoked_at': now,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=lifetime)
+        }
+        if self.collection is not None:
+            self.collection.replace_one({'_id': doc['_id']}, doc, upsert=True)
+        self._apply(doc)
+
+    def revoke_token(self, jti: str, exp) -> bool:
+        # Returns False when the token was already revoked, so a refresh token
+        # presented twice (concurrently or replayed) is only honoured once
+        with self._lock:
+            if jti in self._jtis:
+                return False
+        now = datetime.utcnow()
+        doc = {
+            '_id': f'jti:{jti}',
+            'kind': 'token',
+            'jti': jti,
+            'created_at': now,
+            'expires_at': datetime.utcfromtimestamp(exp) if exp else now + timedelta(days=1)
+        }
+        if self.collection is not None:
+            try:
+                self.collection.insert_one(doc)
+            except DuplicateKeyError:
+                self._apply(doc)
+                return False
+        self._apply(doc)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'users': len(self._users), 'tokens': len(self._jtis)}
@@ -405,8 +405,7 @@ export function AdminDashboard() {
   }
 
   const handleLogout = () => {
-    localStorage.removeItem("user")
-    localStorage.removeItem("token")
+    api.auth.logout()
     router.push("/")
   }
 
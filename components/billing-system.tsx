@@ -201,14 +201,30 @@ export function BillingSystem() {
     }
   }
 
-  const handleImageUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
+  // Images are uploaded once and referenced by URL; the server deduplicates
+  // identical files and serves small thumbnails for previews
+  const handleImageUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
     const files = event.target.files
-    if (files) {
-      const newImages = Array.from(files).map((file) => URL.createObjectURL(file))
-      setDesignImages([...designImages, ...newImages])
+    if (files && files.length > 0) {
+      try {
+        const response = await api.blobs.upload(Array.from(files))
+        const newImages = response.blobs.map((blob: { url: string }) => blob.url)
+        setDesignImages((images) => [...images, ...newImages])
+      } catch (error) {
+        console.error("Error uploading images:", error)
+        toast({
+          title: "Error",
+          description: "Failed to upload images. Please try again.",
+          variant: "destructive",
+        })
+      } finally {
+        event.target.value = ""
+      }
     }
   }
 
+  const thumbnailOf = (image: string) => (image.includes("/api/blobs/") ? `${image}/thumbnail` : image)
+
   const calculateSubtotal = () => {
     return billItems.reduce((sum, item) => sum + item.total, 0)
   }
@@ -715,7 +731,7 @@ export function BillingSystem() {
                       {designImages.map((image, index) => (
                         <div key={index} className="relative">
                           <img
-                            src={image || "/placeholder.svg"}
+                            src={thumbnailOf(image) || "/placeholder.svg"}
                             alt={`Design ${index + 1}`}
                             className="w-full h-24 object-cover rounded border border-violet-100"
                           />
@@ -116,8 +116,22 @@ export function ReportsModule() {
 
   const exportToCSV = async () => {
     try {
-      await api.reports.export(reportType, "csv")
-      toast.success("CSV export is being prepared...")
+      // Map each report view onto the backend's bills/customers/jobs exports
+      const exports: Record<string, { type: string; filters?: Record<string, string> }> = {
+        revenue: { type: "bills" },
+        customers: { type: "customers" },
+        tailors: { type: "jobs" },
+        outstanding: { type: "bills", filters: { status: "pending" } },
+      }
+      const { type: exportType, filters } = exports[reportType] || exports.revenue
+      const blob = await api.reports.export(exportType, "csv", filters)
+      const url = URL.createObjectURL(blob)
+      const link = document.createElement("a")
+      link.href = url
+      link.download = `${exportType}-${new Date().toISOString().split("T")[0]}.csv`
+      link.click()
+      URL.revokeObjectURL(url)
+      toast.success("CSV export downloaded.")
     } catch (error) {
       toast.error("Failed to export CSV")
     }
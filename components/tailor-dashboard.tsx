@@ -72,8 +72,7 @@ export function TailorDashboard() {
   }
 
   const handleLogout = () => {
-    localStorage.removeItem("user")
-    localStorage.removeItem("token")
+    api.auth.logout()
     router.push("/")
   }
 
@@ -9,16 +9,101 @@ const getAuthToken = () => {
   return null
 }
 
+const getRefreshToken = () => {
+  if (typeof window !== "undefined") {
+    return localStorage.getItem("refresh_token")
+  }
+  return null
+}
+
+const storeTokens = (data: { token?: string; refresh_token?: string }) => {
+  if (data.token) localStorage.setItem("auth_token", data.token)
+  if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
+}
+
+const clearSession = () => {
+  localStorage.removeItem("auth_token")
+  localStorage.removeItem("refresh_token")
+  localStorage.removeItem("user")
+}
+
+// Access tokens are short-lived. Concurrent 401s share one refresh, and tabs
+// take turns through a Web Lock so two of them never spend the same
+// single-use refresh token (the server treats reuse as theft and ends every
+// session). "expired" means the server definitely refused the session;
+// "unavailable" (network error, 5xx) leaves it alone so a later call can retry.
+type RefreshOutcome = "refreshed" | "expired" | "unavailable"
+
+let refreshInFlight: Promise<RefreshOutcome> | null = null
+
+const withRefreshLock = <T,>(fn: () => Promise<T>): Promise<T> =>
+  typeof navigator !== "undefined" && navigator.locks ? navigator.locks.request("auth-refresh", fn) : fn()
+
+const refreshAccessToken = (rejectedToken: string): Promise<RefreshOutcome> => {
+  if (!refreshInFlight) {
+    refreshInFlight = withRefreshLock(async (): Promise<RefreshOutcome> => {
+      // Another tab may have refreshed while this one waited for the lock
+      if (getAuthToken() !== rejectedToken) return getAuthToken() ? "refreshed" : "expired"
+      const refreshToken = getRefreshToken()
+      if (!refreshToken) return "expired"
+
+      let response: Response
+      try {
+        response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        })
+      } catch {
+        return "unavailable"
+      }
+      if (response.ok) {
+        storeTokens(await response.json())
+        return "refreshed"
+      }
+      if (response.status === 401) {
+        // Without Web Locks another tab may still have rotated it first
+        return getRefreshToken() !== refreshToken ? "refreshed" : "expired"
+      }
+      return "unavailable"
+    }).finally(() => {
+      refreshInFlight = null
+    })
+  }
+  return refreshInFlight
+}
+
+// fetch with the current access token; on a 401 refreshes once and retries.
+// A 401 is only passed on when the session is really over.
+const authorizedFetch = async (url: string, init: RequestInit = {}) => {
+  const token = getAuthToken()
+  const send = (accessToken: string | null) => {
+    const headers = new Headers(init.headers)
+    if (accessToken) {
+      headers.set("Authorization", `Bearer ${accessToken}`)
+    }
+    return fetch(url, { ...init, headers })
+  }
+
+  const response = await send(token)
+  if (response.status === 401 && token) {
+    const outcome = await refreshAccessToken(token)
+    if (outcome === "refreshed") {
+      return send(getAuthToken())
+    }
+    if (outcome === "unavailable") {
+      throw new Error("Could not renew the session. Check your connection and try again.")
+    }
+  }
+  return response
+}
+
 // Helper function to make authenticated requests
 const makeRequest = async (endpoint: string, options: RequestInit = {}) => {
-  const token = getAuthToken()
   const url = `${API_BASE_URL}${endpoint}`
 
   const headers = new Headers()
   headers.append("Content-Type", "application/json")
-  if (token) {
-    headers.append("Authorization", `Bearer ${token}`)
-  }
 
   if (options.headers) {
     Object.entries(options.headers).forEach(([key, value]) => {
@@ -26,17 +111,11 @@ const makeRequest = async (endpoint: string, options: RequestInit = {}) => {
     })
   }
 
-  const config: RequestInit = {
-    headers,
-    ...options,
-  }
-
   try {
-    const response = await fetch(url, config)
+    const response = await authorizedFetch(url, { ...options, headers })
 
     if (response.status === 401) {
-      localStorage.removeItem("auth_token")
-      localStorage.removeItem("user")
+      clearSession()
       throw new Error("Session expired. Please login again.")
     }
 
@@ -58,6 +137,13 @@ const makeRequest = async (endpoint: string, options: RequestInit = {}) => {
 }
 
 // Helpers
+// Pagination block of list responses; pass next_cursor back as cursor for the next page
+export type ListPagination = {
+  next_cursor?: string | null
+  has_next?: boolean
+  [key: string]: any
+}
+
 function normalizeList<T = any>(data: any, key: string): T[] {
   if (Array.isArray(data)) return data as T[]
   if (data && Array.isArray(data[key])) return data[key] as T[]
@@ -75,7 +161,7 @@ export const authAPI = {
     })
 
     if (response.token) {
-      localStorage.setItem("auth_token", response.token)
+      storeTokens(response)
       localStorage.setItem("user", JSON.stringify(response.user))
     }
 
@@ -93,9 +179,17 @@ export const authAPI = {
     return makeRequest("/auth/verify")
   },
 
+  // Revokes the refresh token server-side; the local session is cleared either way
   logout: () => {
-    localStorage.removeItem("auth_token")
-    localStorage.removeItem("user")
+    const refreshToken = getRefreshToken()
+    if (refreshToken) {
+      fetch(`${API_BASE_URL}/auth/logout`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => {})
+    }
+    clearSession()
   },
 
   getCurrentUser: () => {
@@ -109,11 +203,21 @@ export const authAPI = {
 
 // Customer API
 export const customerAPI = {
-  getAll: async (params: { search?: string; page?: number; limit?: number } = {}) => {
+  getAll: async (
+    params: {
+      search?: string
+      page?: number
+      limit?: number
+      cursor?: string
+      with_total?: "exact" | "estimate" | "false"
+    } = {},
+  ) => {
     const searchParams = new URLSearchParams()
     if (params.search) searchParams.append("search", params.search)
     if (params.page) searchParams.append("page", params.page.toString())
     if (params.limit) searchParams.append("limit", params.limit.toString())
+    if (params.cursor !== undefined) searchParams.append("cursor", params.cursor)
+    if (params.with_total) searchParams.append("with_total", params.with_total)
 
     return makeRequest(`/customers?${searchParams.toString()}`)
   },
@@ -122,6 +226,28 @@ export const customerAPI = {
     return makeRequest(`/customers/${id}`)
   },
 
+  // Upload a CSV or JSON file; rows are upserted by phone (mode "skip" leaves existing customers alone)
+  import: async (file: File, mode: "upsert" | "skip" = "upsert") => {
+    const body = new FormData()
+    body.append("file", file)
+
+    const response = await authorizedFetch(`${API_BASE_URL}/customers/import?mode=${mode}`, {
+      method: "POST",
+      body,
+    })
+
+    const data = await response.json().catch(() => ({}))
+    if (!response.ok) {
+      throw new Error(data.message || `HTTP error! status: ${response.status}`)
+    }
+    return data
+  },
+
+  suggest: async (q: string, limit = 10) => {
+    const searchParams = new URLSearchParams({ q, limit: limit.toString() })
+    return makeRequest(`/customers/suggest?${searchParams.toString()}`)
+  },
+
   create: async (customer: { name: string; phone: string; email?: string; address?: string; notes?: string }) => {
     return makeRequest("/customers", {
       method: "POST",
@@ -159,21 +285,26 @@ export const billsAPI = {
       customer_id?: string
       page?: number
       limit?: number
+      cursor?: string
+      with_total?: "exact" | "estimate" | "false"
     } = {},
-  ): Promise<{ bills: any[] }> => {
+  ): Promise<{ bills: any[]; pagination?: ListPagination }> => {
     const searchParams = new URLSearchParams()
     Object.entries(params).forEach(([key, value]) => {
-      if (value !== undefined && value !== null && value !== "") {
+      // An empty cursor is meaningful: it starts keyset paging from the first page
+      if (value !== undefined && value !== null && (value !== "" || key === "cursor")) {
         searchParams.append(key, value.toString())
       }
     })
 
     const data = await makeRequest(`/bills?${searchParams.toString()}`)
-    return { bills: normalizeList<any>(data, "bills") }
+    return { bills: normalizeList<any>(data, "bills"), pagination: data?.pagination }
   },
 
-  getById: async (id: string) => {
-    return makeRequest(`/bills/${id}`)
+  // Items, drawings and the signature are omitted unless listed in fields (or fields is "all")
+  getById: async (id: string, fields?: string[] | "all") => {
+    const query = fields ? `?fields=${encodeURIComponent(fields === "all" ? "all" : fields.join(","))}` : ""
+    return makeRequest(`/bills/${id}${query}`)
   },
 
   create: async (bill: {
@@ -206,6 +337,15 @@ export const billsAPI = {
     })
   },
 
+  // Syncs bills entered offline; each result carries its index and optional client_ref.
+  // created_at (ISO 8601, within the server's allowed window) keeps the time the bill was entered
+  bulkCreate: async (bills: Array<Record<string, any> & { client_ref?: string; created_at?: string }>) => {
+    return makeRequest("/bills/bulk", {
+      method: "POST",
+      body: JSON.stringify({ bills }),
+    })
+  },
+
   update: async (id: string, bill: any) => {
     return makeRequest(`/bills/${id}`, {
       method: "PUT",
@@ -265,18 +405,21 @@ export const tailorsAPI = {
       status?: string
       page?: number
       limit?: number
+      cursor?: string
+      with_total?: "exact" | "estimate" | "false"
     } = {},
-  ): Promise<{ tailors: any[] }> => {
+  ): Promise<{ tailors: any[]; pagination?: ListPagination }> => {
     const searchParams = new URLSearchParams()
     Object.entries(params).forEach(([key, value]) => {
-      if (value !== undefined && value !== null && value !== "") {
+      // An empty cursor is meaningful: it starts keyset paging from the first page
+      if (value !== undefined && value !== null && (value !== "" || key === "cursor")) {
         searchParams.append(key, value.toString())
       }
     })
 
     const data = await makeRequest(`/tailors?${searchParams.toString()}`)
     const tailors = normalizeList<any>(data, "tailors").map((t: any) => ({ ...t, id: t?.id || t?._id }))
-    return { tailors }
+    return { tailors, pagination: data?.pagination }
   },
 
   getById: async (id: string) => {
@@ -342,11 +485,14 @@ export const jobsAPI = {
       priority?: string
       page?: number
       limit?: number
+      cursor?: string
+      with_total?: "exact" | "estimate" | "false"
     } = {},
-  ): Promise<{ jobs: any[] }> => {
+  ): Promise<{ jobs: any[]; pagination?: ListPagination }> => {
     const searchParams = new URLSearchParams()
     Object.entries(params).forEach(([key, value]) => {
-      if (value !== undefined && value !== null && value !== "") {
+      // An empty cursor is meaningful: it starts keyset paging from the first page
+      if (value !== undefined && value !== null && (value !== "" || key === "cursor")) {
         searchParams.append(key, value.toString())
       }
     })
@@ -357,7 +503,7 @@ export const jobsAPI = {
       id: j?.id || j?._id,
       assigned_date: j?.assigned_date || j?.createdAt || j?.created_at || j?.assignedAt,
     }))
-    return { jobs }
+    return { jobs, pagination: data?.pagination }
   },
 
   getById: async (id: string) => {
@@ -475,11 +621,45 @@ export const reportsAPI = {
     return makeRequest("/reports/outstanding")
   },
 
-  export: async (report_type: string, format: "csv" | "pdf" = "csv") => {
-    return makeRequest("/reports/export", {
+  // Streams a CSV (or newline-delimited JSON) file; resolves to the downloaded Blob
+  export: async (report_type: string, format: "csv" | "json" = "csv", filters: Record<string, string> = {}) => {
+    const response = await authorizedFetch(`${API_BASE_URL}/reports/export`, {
       method: "POST",
-      body: JSON.stringify({ report_type, format }),
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ report_type, format, ...filters }),
     })
+
+    if (!response.ok) {
+      let errorData
+      try {
+        errorData = await response.json()
+      } catch {
+        errorData = { message: `HTTP error! status: ${response.status}` }
+      }
+      throw new Error(errorData.message || `HTTP error! status: ${response.status}`)
+    }
+
+    return response.blob()
+  },
+}
+
+// Blob API - uploads are content-addressed, so the same file is stored once
+export const blobsAPI = {
+  upload: async (files: File[]) => {
+    const body = new FormData()
+    files.forEach((file) => body.append("files", file))
+
+    // No Content-Type header: the browser sets the multipart boundary
+    const response = await authorizedFetch(`${API_BASE_URL}/blobs`, {
+      method: "POST",
+      body,
+    })
+
+    const data = await response.json().catch(() => ({}))
+    if (!response.ok) {
+      throw new Error(data.message || `HTTP error! status: ${response.status}`)
+    }
+    return data
   },
 }
 
@@ -505,6 +685,7 @@ export const api = {
   tailors: tailorsAPI,
   jobs: jobsAPI,
   reports: reportsAPI,
+  blobs: blobsAPI,
   dashboard: dashboardAPI,
   health: healthAPI,
   settings: {